@@ -0,0 +1,123 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from redis.exceptions import RedisError
+
+from book.models import Book
+from library_service.instrumentation import CACHE_REQUESTS
+
+# Bump when the shape of cached book metadata changes.
+BOOK_CACHE_VERSION = 1
+BOOK_FIELDS = ("title", "author", "cover", "daily_fee")
+
+logger = logging.getLogger(__name__)
+
+
+def book_key(book_id) -> str:
+    return f"book:{book_id}"
+
+
+def availability_key(book_id) -> str:
+    return f"book:{book_id}:inventory"
+
+
+def call_cache(method, *args, default=None, **kwargs):
+    """
+    Call a cache method, treating an unreachable cache as a miss so that
+    a Redis outage slows requests down instead of failing them.
+    """
+    try:
+        return method(*args, **kwargs)
+    except RedisError as e:
+        logger.warning(f"Book cache unavailable: {e}")
+        return default
+
+
+def get_books(book_ids) -> dict:
+    """
+    Read-through lookup of book metadata (title, author, cover,
+    daily_fee) keyed by book id. Inventory is cached separately so that
+    borrowing and returning do not evict the catalog.
+    """
+    keys = {book_key(book_id): book_id for book_id in book_ids}
+    cached = call_cache(cache.get_many, keys, version=BOOK_CACHE_VERSION, default={})
+    CACHE_REQUESTS.inc(len(cached), cache="book", result="hit")
+
+    books = {keys[key]: data for key, data in cached.items()}
+    missing = [book_id for key, book_id in keys.items() if key not in cached]
+    if missing:
+        CACHE_REQUESTS.inc(len(missing), cache="book", result="miss")
+        fetched = {
+            row.pop("id"): row
+            for row in Book.objects.filter(pk__in=missing).values("id", *BOOK_FIELDS)
+        }
+        call_cache(
+            cache.set_many,
+            {book_key(book_id): data for book_id, data in fetched.items()},
+            settings.BOOK_CACHE_TIMEOUT,
+            version=BOOK_CACHE_VERSION,
+        )
+        books.update(fetched)
+    return books
+
+
+def get_availability(book_id) -> int:
+    """
+    Copies of the book on the shelf. The authoritative check is still
+    the conditional UPDATE made when a copy is reserved.
+    """
+    key = availability_key(book_id)
+    inventory = call_cache(cache.get, key, version=BOOK_CACHE_VERSION)
+    if inventory is not None:
+        CACHE_REQUESTS.inc(cache="availability", result="hit")
+        return inventory
+
+    CACHE_REQUESTS.inc(cache="availability", result="miss")
+    inventory = Book.objects.values_list("inventory", flat=True).get(pk=book_id)
+    call_cache(
+        cache.set,
+        key,
+        inventory,
+        settings.BOOK_AVAILABILITY_CACHE_TIMEOUT,
+        version=BOOK_CACHE_VERSION,
+    )
+    return inventory
+
+
+def invalidate_availability(book_ids) -> None:
+    """
+    Drop cached inventory once the surrounding transaction commits, so a
+    concurrent read cannot cache the value from before the change.
+    """
+    keys = [availability_key(book_id) for book_id in book_ids]
+    transaction.on_commit(
+        lambda: call_cache(cache.delete_many, keys, version=BOOK_CACHE_VERSION)
+    )
+
+
+def invalidate_books(book_ids) -> None:
+    keys = [
+        key
+        for book_id in book_ids
+        for key in (book_key(book_id), availability_key(book_id))
+    ]
+    transaction.on_commit(
+        lambda: call_cache(cache.delete_many, keys, version=BOOK_CACHE_VERSION)
+    )
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {"inventory"}:
+        invalidate_availability([instance.pk])
+    else:
+        invalidate_books([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    invalidate_books([instance.pk])
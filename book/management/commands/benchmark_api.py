@@ -0,0 +1,163 @@
+import itertools
+import json
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from book.models import Book
+
+session_ids = itertools.count()
+
+
+def fake_stripe_session(session_id=None, **kwargs):
+    session_id = session_id or f"cs_benchmark_{next(session_ids)}"
+    return SimpleNamespace(
+        id=session_id,
+        url=f"https://checkout.stripe.com/c/pay/{session_id}",
+        payment_status="paid",
+        amount_total=100,
+        currency="usd",
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the list, create, return and pay endpoints concurrently "
+        "through the real URLconf with Stripe and Telegram stubbed, and "
+        "report latency percentiles, throughput and queries per request as JSON."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        users = list(
+            get_user_model().objects.filter(email__startswith="seed-user-")[
+                : options["workers"]
+            ]
+        )
+        book_ids = list(
+            Book.objects.filter(inventory__gt=0).values_list("id", flat=True)[:1000]
+        )
+        if len(users) < options["workers"] or not book_ids:
+            raise CommandError("Not enough seeded data, run seed_load first.")
+
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+        started = time.perf_counter()
+        with (
+            patch("stripe.checkout.Session.create", side_effect=fake_stripe_session),
+            patch("stripe.checkout.Session.retrieve", side_effect=fake_stripe_session),
+            patch("telegram_client.get_telegram_client"),
+            ThreadPoolExecutor(max_workers=options["workers"]) as executor,
+        ):
+            list(
+                executor.map(
+                    lambda user: self._run_user(user, book_ids, options["iterations"]),
+                    users,
+                )
+            )
+        elapsed = time.perf_counter() - started
+
+        report = {
+            "workers": options["workers"],
+            "iterations": options["iterations"],
+            "duration": round(elapsed, 3),
+            "endpoints": {
+                name: self._summarize(samples, elapsed)
+                for name, samples in sorted(self.samples.items())
+            },
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def _request(self, name, method, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = method(*args, **kwargs)
+            latency = time.perf_counter() - started
+
+        with self.lock:
+            self.samples[name].append((latency, len(queries), response.status_code))
+        return response
+
+    def _run_user(self, user, book_ids, iterations):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        borrowings_url = reverse("borrowing:borrowing-list")
+
+        try:
+            for iteration in range(iterations):
+                self._request("list", client.get, borrowings_url)
+
+                created = self._request(
+                    "create",
+                    client.post,
+                    borrowings_url,
+                    {
+                        "book": book_ids[iteration % len(book_ids)],
+                        "expected_return_date": date.today() + timedelta(days=7),
+                    },
+                )
+                if created.status_code != 201:
+                    continue
+                borrowing_id = created.data["id"]
+
+                self._request(
+                    "return",
+                    client.post,
+                    reverse(
+                        "borrowing:borrowing-return-book", kwargs={"pk": borrowing_id}
+                    ),
+                )
+                paid = self._request(
+                    "pay",
+                    client.post,
+                    reverse("payment:payment-list"),
+                    {"borrowing_id": borrowing_id, "money": "1.00"},
+                )
+                self._request(
+                    "pay_success",
+                    client.get,
+                    reverse("payment:payment-success"),
+                    {"session_id": paid.data.get("session_id")},
+                )
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _summarize(samples, elapsed):
+        latencies = sorted(latency for latency, _, _ in samples)
+        if len(latencies) > 1:
+            percentiles = statistics.quantiles(latencies, n=100)
+        else:
+            percentiles = latencies * 99
+        return {
+            "requests": len(samples),
+            "errors": sum(1 for _, _, code in samples if code >= 400),
+            "rps": round(len(samples) / elapsed, 1),
+            "p50_ms": round(percentiles[49] * 1000, 2),
+            "p95_ms": round(percentiles[94] * 1000, 2),
+            "p99_ms": round(percentiles[98] * 1000, 2),
+            "queries_per_request": round(
+                statistics.mean(count for _, count, _ in samples), 2
+            ),
+        }
@@ -0,0 +1,91 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from library_service.instrumentation import CACHE_REQUESTS
+
+
+class Command(BaseCommand):
+    help = (
+        "Request the book list and the borrowing list and detail "
+        "endpoints with the book cache on and off, and report latency, "
+        "queries per request and cache hit rate as JSON."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        user = (
+            get_user_model()
+            .objects.filter(email__startswith="seed-user-")
+            .annotate(borrowing_count=Count("borrowings"))
+            .order_by("-borrowing_count")
+            .first()
+        )
+        borrowing_ids = list(
+            user.borrowings.values_list("id", flat=True)[: options["requests"]]
+            if user
+            else []
+        )
+        if not borrowing_ids:
+            raise CommandError("Not enough seeded data, run seed_load first.")
+
+        client = APIClient()
+        client.force_authenticate(user=user)
+        endpoints = {
+            "books": lambda i: reverse("book:book-list"),
+            "borrowings": lambda i: reverse("borrowing:borrowing-list"),
+            "borrowing_detail": lambda i: reverse(
+                "borrowing:borrowing-detail",
+                kwargs={"pk": borrowing_ids[i % len(borrowing_ids)]},
+            ),
+        }
+
+        report = {}
+        for enabled in (False, True):
+            cache.clear()
+            hits = CACHE_REQUESTS.value(cache="book", result="hit")
+            misses = CACHE_REQUESTS.value(cache="book", result="miss")
+
+            with override_settings(BOOK_CACHE_ENABLED=enabled):
+                results = {
+                    name: self._measure(client, url, options["requests"])
+                    for name, url in endpoints.items()
+                }
+
+            hits = CACHE_REQUESTS.value(cache="book", result="hit") - hits
+            misses = CACHE_REQUESTS.value(cache="book", result="miss") - misses
+            if hits + misses:
+                results["book_cache_hit_rate"] = round(hits / (hits + misses), 4)
+            report["cache_on" if enabled else "cache_off"] = results
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    def _measure(client, url, count):
+        latencies = []
+        query_counts = []
+        for i in range(count):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                client.get(url(i))
+                latencies.append(time.perf_counter() - started)
+            query_counts.append(len(queries))
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "p50_ms": round(percentiles[49] * 1000, 2),
+            "p99_ms": round(percentiles[98] * 1000, 2),
+            "queries_per_request": round(statistics.mean(query_counts), 2),
+        }
@@ -0,0 +1,81 @@
+import json
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from book.management.commands.seed_load import LAST_NAMES, TITLE_WORDS
+from book.models import Book
+from book.search import BookSearchValuesSerializer, search_books
+
+TARGET_P99_MS = 20
+
+
+def misspell(word, rng):
+    index = rng.randrange(1, len(word))
+    return word[:index] + word[index - 1] + word[index:]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time /api/books/search/ for single-word, multi-word, prefix, author "
+        "and misspelled queries and report latency percentiles and the plan "
+        "of each kind as JSON. Seed the catalog first, e.g. seed_load "
+        "--books 5000000 --users 0 --borrowings 0 --payments 0."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        catalog_size = Book.objects.count()
+        if not catalog_size:
+            raise CommandError("Not enough seeded data, run seed_load first.")
+
+        rng = random.Random(options["seed"])
+        long_words = [word for word in TITLE_WORDS if len(word) > 4]
+        kinds = {
+            "single_word": lambda: rng.choice(long_words),
+            "two_words": lambda: " ".join(rng.sample(long_words, 2)),
+            "prefix": lambda: rng.choice(long_words)[:4],
+            "author": lambda: rng.choice(LAST_NAMES),
+            "misspelled": lambda: misspell(rng.choice(long_words), rng),
+        }
+
+        client = APIClient()
+        report = {"catalog_size": catalog_size, "target_p99_ms": TARGET_P99_MS}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for kind, make_query in kinds.items():
+                report[kind] = self._measure(
+                    client, [make_query() for _ in range(options["requests"])]
+                )
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    def _measure(client, queries):
+        url = reverse("book-search")
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            client.get(url, {"q": query})
+            latencies.append(time.perf_counter() - started)
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        p99_ms = round(percentiles[98] * 1000, 2)
+        queryset = BookSearchValuesSerializer.prepare_queryset(
+            search_books(queries[0])
+        ).order_by("-rank", "id")[: settings.API_PAGE_SIZE]
+        return {
+            "example": queries[0],
+            "p50_ms": round(percentiles[49] * 1000, 2),
+            "p99_ms": p99_ms,
+            "within_target": p99_ms < TARGET_P99_MS,
+            "plan": queryset.explain(analyze=True, buffers=True).splitlines(),
+        }
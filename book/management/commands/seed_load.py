@@ -0,0 +1,182 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from book.models import Book
+from borrowing.models import Borrowing
+from payment.models import Payment
+
+SEED_PASSWORD = "seed-password"
+SEED_EMAIL = "seed-user-{}@example.com"
+# Borrow dates are spread over this many past days, so that indexes led by
+# borrow_date see realistic cardinality.
+BORROW_DATE_SPREAD_DAYS = 3 * 365
+
+# Titles and authors are composed from these so that search benchmarks
+# see a realistic spread of common and rare terms.
+# fmt: off
+TITLE_WORDS = (
+    "the", "of", "and", "a", "in", "night", "river", "dragon", "silent",
+    "garden", "empire", "winter", "shadow", "city", "lost", "secret",
+    "history", "war", "peace", "stone", "fire", "house", "ocean", "king",
+    "queen", "machine", "learning", "python", "journey", "mountain",
+    "forgotten", "letters", "midnight", "storm", "island", "star", "glass",
+    "iron", "silver", "golden", "daughter", "son", "last", "first",
+    "kingdom", "library", "science", "poetry", "memory", "light",
+)
+FIRST_NAMES = (
+    "Anna", "Boris", "Clara", "David", "Elena", "Felix", "Grace", "Hugo",
+    "Irina", "James", "Kateryna", "Leo", "Maria", "Nikolai", "Olga", "Pavlo",
+    "Quinn", "Rosa", "Stepan", "Taras", "Ulyana", "Victor", "Wanda", "Yurii",
+)
+LAST_NAMES = (
+    "Adams", "Bondarenko", "Carter", "Dovzhenko", "Evans", "Franko",
+    "Garcia", "Hrushevsky", "Ivanenko", "Johnson", "Kovalenko", "Lysenko",
+    "Miller", "Nechuy", "Olesko", "Petrenko", "Quincey", "Rudenko",
+    "Shevchenko", "Tkachenko", "Ukrainka", "Vovchok", "Walker", "Zhuk",
+)
+# fmt: on
+
+
+class Command(BaseCommand):
+    help = "Generate a large dataset with bulk inserts for load testing."  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=100_000)
+        parser.add_argument("--users", type=int, default=1_000_000)
+        parser.add_argument("--borrowings", type=int, default=5_000_000)
+        parser.add_argument("--payments", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.random = random.Random(options["seed"])
+
+        book_ids = self._seed_books(options["books"])
+        user_ids = self._seed_users(options["users"])
+        borrowing_ids = self._seed_borrowings(options["borrowings"], book_ids, user_ids)
+        self._seed_payments(options["payments"], borrowing_ids)
+
+        call_command("reconcile_pending_payments", stdout=self.stdout)
+
+    def _bulk_create(self, model, objects, total, restore=()):
+        """
+        Insert objects in batches and return their ids. Fields in restore
+        are written back after the insert, for values that pre_save
+        overwrites, like auto_now_add dates.
+        """
+        ids = []
+        started = time.perf_counter()
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                ids.extend(self._insert_batch(model, batch, restore))
+                batch = []
+        if batch:
+            ids.extend(self._insert_batch(model, batch, restore))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{model.__name__}: {total:,} rows in {elapsed:.1f}s "
+            f"({total / max(elapsed, 1e-9):,.0f} rows/s)"
+        )
+        return ids
+
+    def _insert_batch(self, model, batch, restore):
+        values = [[getattr(obj, field) for field in restore] for obj in batch]
+        model.objects.bulk_create(batch)
+        if restore:
+            for obj, row in zip(batch, values):
+                for field, value in zip(restore, row):
+                    setattr(obj, field, value)
+            model.objects.bulk_update(batch, restore)
+        return [obj.pk for obj in batch]
+
+    def _seed_books(self, count):
+        return self._bulk_create(
+            Book,
+            (
+                Book(
+                    title=" ".join(
+                        self.random.choices(TITLE_WORDS, k=self.random.randint(2, 5))
+                    ).capitalize(),
+                    author=(
+                        f"{self.random.choice(FIRST_NAMES)} "
+                        f"{self.random.choice(LAST_NAMES)}"
+                    ),
+                    cover=self.random.choice(("HARD", "SOFT")),
+                    inventory=self.random.randint(0, 50),
+                    daily_fee=self.random.randint(1, 20),
+                )
+                for _ in range(count)
+            ),
+            count,
+        )
+
+    def _seed_users(self, count):
+        password = make_password(SEED_PASSWORD)
+        user_model = get_user_model()
+        offset = user_model.objects.count()
+        return self._bulk_create(
+            user_model,
+            (
+                user_model(email=SEED_EMAIL.format(offset + index), password=password)
+                for index in range(count)
+            ),
+            count,
+        )
+
+    def _seed_borrowings(self, count, book_ids, user_ids):
+        today = date.today()
+
+        def borrowings():
+            for _ in range(count):
+                borrow_date = today - timedelta(
+                    days=self.random.randint(0, BORROW_DATE_SPREAD_DAYS)
+                )
+                expected_return_date = borrow_date + timedelta(
+                    days=self.random.randint(1, 30)
+                )
+                actual_return_date = expected_return_date + timedelta(
+                    days=self.random.randint(-10, 10)
+                )
+                returned = self.random.random() < 0.7 and actual_return_date <= today
+                yield Borrowing(
+                    book_id=self.random.choice(book_ids),
+                    user_id=self.random.choice(user_ids),
+                    borrow_date=borrow_date,
+                    expected_return_date=expected_return_date,
+                    actual_return_date=(
+                        max(actual_return_date, borrow_date) if returned else None
+                    ),
+                )
+
+        # borrow_date is auto_now_add, which stamps every row with today on
+        # insert, so the spread dates are written back after each batch
+        return self._bulk_create(
+            Borrowing, borrowings(), count, restore=("borrow_date",)
+        )
+
+    def _seed_payments(self, count, borrowing_ids):
+        # session_id is unique, so numbering continues after earlier runs
+        offset = Payment.objects.count()
+
+        def payments():
+            for index in range(offset, offset + count):
+                yield Payment(
+                    borrowing_id=self.random.choice(borrowing_ids),
+                    status="PAID" if self.random.random() < 0.9 else "PENDING",
+                    type=self.random.choice(("PAYMENT", "FINE")),
+                    session_url=f"https://checkout.stripe.com/c/pay/seed_{index}",
+                    session_id=f"cs_seed_{index}",
+                    money_to_pay=self.random.randint(100, 10_000) / 100,
+                )
+
+        self._bulk_create(Payment, payments(), count)
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:00
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    # Must follow the latest book migration of the deployed tree
+    dependencies = [
+        ("book", "0001_initial"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        # A stored generated column stays current on every insert and
+        # update without triggers. It is read through RawSQL in
+        # book.search, so it is not part of the model state.
+        migrations.RunSQL(
+            sql=(
+                'ALTER TABLE "book_book" ADD COLUMN "search_vector" tsvector '
+                "GENERATED ALWAYS AS ("
+                "setweight(to_tsvector('english', coalesce(\"title\", '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(\"author\", '')), 'B')"
+                ") STORED"
+            ),
+            reverse_sql='ALTER TABLE "book_book" DROP COLUMN "search_vector"',
+        ),
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX CONCURRENTLY "book_search_vector_idx" '
+                'ON "book_book" USING gin ("search_vector")'
+            ),
+            reverse_sql='DROP INDEX CONCURRENTLY "book_search_vector_idx"',
+        ),
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX CONCURRENTLY "book_title_trgm_idx" '
+                'ON "book_book" USING gin ("title" gin_trgm_ops)'
+            ),
+            reverse_sql='DROP INDEX CONCURRENTLY "book_title_trgm_idx"',
+        ),
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX CONCURRENTLY "book_author_trgm_idx" '
+                'ON "book_book" USING gin ("author" gin_trgm_ops)'
+            ),
+            reverse_sql='DROP INDEX CONCURRENTLY "book_author_trgm_idx"',
+        ),
+    ]
@@ -0,0 +1,111 @@
+import re
+from functools import partial
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+    TrigramWordSimilarity,
+)
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny
+
+from book.models import Book
+from library_service.pagination import RankedPagination
+from library_service.values_serializers import ValuesSerializer
+
+SEARCH_CONFIG = "english"
+MAX_QUERY_TERMS = 8
+# Shorter terms are matched whole: a one- or two-letter prefix expands to
+# most of the catalog and would turn the GIN lookup into a full scan.
+MIN_PREFIX_LENGTH = 3
+
+# Maintained by Postgres as a generated column, see book migration 0002.
+search_vector = RawSQL('"book_book"."search_vector"', (), SearchVectorField())
+
+
+def build_tsquery(query: str) -> str | None:
+    """
+    Turn free text into a raw tsquery where every word must match and
+    words long enough are matched as prefixes, e.g. ``harry pot`` becomes
+    ``harry:* & pot:*``.
+    """
+    terms = re.findall(r"\w+", query.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " & ".join(
+        f"{term}:*" if len(term) >= MIN_PREFIX_LENGTH else term for term in terms
+    )
+
+
+def search_books(query: str):
+    """
+    Books matching ``query`` annotated with their relevance rank. Full-text
+    matches on title (weight A) and author (weight B) come first; when
+    there are none the query is retried by trigram word similarity to
+    tolerate typos. Every match is ranked, so ordering by ``-rank`` and
+    slicing yields the best matches in a single query.
+    """
+    tsquery = build_tsquery(query)
+    if tsquery is None:
+        return Book.objects.none()
+
+    text_query = SearchQuery(tsquery, config=SEARCH_CONFIG, search_type="raw")
+    matches = Book.objects.alias(search=search_vector).filter(search=text_query)
+    if matches.exists():
+        return matches.annotate(
+            rank=SearchRank(search_vector, text_query, cover_density=True)
+        )
+
+    return Book.objects.filter(
+        Q(title__trigram_word_similar=query) | Q(author__trigram_word_similar=query)
+    ).annotate(
+        rank=Greatest(
+            TrigramWordSimilarity(query, "title"),
+            TrigramWordSimilarity(query, "author"),
+        )
+    )
+
+
+class BookSearchValuesSerializer(ValuesSerializer):
+    fields = (
+        ("id", "id", None),
+        ("title", "title", str),
+        ("author", "author", str),
+        ("cover", "cover", str),
+        ("daily_fee", "daily_fee", str),
+        ("rank", "rank", partial(round, ndigits=4)),
+    )
+
+
+class BookSearchPagination(RankedPagination):
+    max_results = settings.BOOK_SEARCH_MAX_RESULTS
+
+
+class BookSearchView(generics.GenericAPIView):
+    """
+    Ranked full-text search over book titles and authors, falling back to
+    trigram similarity for misspelled queries.
+    """
+
+    permission_classes = (AllowAny,)
+    pagination_class = BookSearchPagination
+    serializer_class = BookSearchValuesSerializer
+
+    def get_queryset(self):
+        query = self.request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": "This query parameter is required."})
+        return search_books(query)
+
+    def get(self, request, *args, **kwargs):
+        queryset = BookSearchValuesSerializer.prepare_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            BookSearchValuesSerializer(page, many=True).data
+        )
@@ -0,0 +1,186 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from redis.exceptions import RedisError
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from book.cache import get_availability, get_books
+from book.models import Book
+from book.search import BookSearchPagination
+from borrowing.models import Borrowing
+from library_service.instrumentation import CACHE_REQUESTS
+
+
+class TestBookCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="testuser@example.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=10,
+            daily_fee=5.00,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_books_are_read_through(self):
+        hits = CACHE_REQUESTS.value(cache="book", result="hit")
+
+        with self.assertNumQueries(1):
+            get_books([self.book.id])
+        with self.assertNumQueries(0):
+            books = get_books([self.book.id])
+
+        self.assertEqual(books[self.book.id]["title"], "Test Book")
+        self.assertEqual(CACHE_REQUESTS.value(cache="book", result="hit"), hits + 1)
+
+    def test_book_save_invalidates_metadata(self):
+        get_books([self.book.id])
+
+        self.book.title = "Renamed Book"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+
+        self.assertEqual(
+            get_books([self.book.id])[self.book.id]["title"], "Renamed Book"
+        )
+
+    def test_inventory_save_keeps_metadata(self):
+        get_books([self.book.id])
+        get_availability(self.book.id)
+
+        self.book.inventory = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save(update_fields=["inventory"])
+
+        with self.assertNumQueries(1):
+            get_books([self.book.id])
+            self.assertEqual(get_availability(self.book.id), 3)
+
+    def test_borrow_and_return_invalidate_availability(self):
+        self.assertEqual(get_availability(self.book.id), 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("borrowing:borrowing-list"),
+                {
+                    "book": self.book.id,
+                    "expected_return_date": date.today() + timedelta(days=7),
+                },
+            )
+        self.assertEqual(get_availability(self.book.id), 9)
+
+        borrowing = Borrowing.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("borrowing:borrowing-return-book", kwargs={"pk": borrowing.id})
+            )
+        self.assertEqual(get_availability(self.book.id), 10)
+
+    def test_list_reads_books_from_cache(self):
+        Borrowing.objects.create(
+            book=self.book,
+            user=self.user,
+            expected_return_date=date.today() + timedelta(days=7),
+        )
+        url = reverse("borrowing:borrowing-list")
+        self.client.get(url)
+
+        with override_settings(BOOK_CACHE_ENABLED=False):
+            uncached = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url)
+
+        self.assertEqual(cached.content, uncached.content)
+        self.assertFalse(any(Book._meta.db_table in query["sql"] for query in queries))
+
+    def test_cache_outage_falls_back_to_database(self):
+        down = RedisError("Connection refused")
+        with patch.object(cache, "get_many", side_effect=down), patch.object(
+            cache, "get", side_effect=down
+        ), patch.object(cache, "set_many", side_effect=down), patch.object(
+            cache, "set", side_effect=down
+        ):
+            self.assertEqual(
+                get_books([self.book.id])[self.book.id]["title"], "Test Book"
+            )
+            self.assertEqual(get_availability(self.book.id), 10)
+
+
+class TestBookSearch(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for title, author in (
+            ("The Silent Dragon", "Anna Franko"),
+            ("Letters of Shevchenko", "Olga Petrenko"),
+            ("Winter River", "Taras Shevchenko"),
+        ):
+            Book.objects.create(
+                title=title, author=author, cover="HARD", inventory=1, daily_fee=1
+            )
+
+    def search(self, **params):
+        return self.client.get(reverse("book-search"), params)
+
+    def test_prefix_search_over_title_and_author(self):
+        response = self.search(q="drag")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [book["title"] for book in response.data["results"]], ["The Silent Dragon"]
+        )
+
+        response = self.search(q="fran")
+        self.assertEqual(response.data["results"][0]["author"], "Anna Franko")
+        self.assertIsInstance(response.data["results"][0]["daily_fee"], str)
+
+    def test_title_matches_rank_above_author_matches(self):
+        response = self.search(q="shevchenko")
+
+        self.assertEqual(
+            [book["title"] for book in response.data["results"]],
+            ["Letters of Shevchenko", "Winter River"],
+        )
+        ranks = [book["rank"] for book in response.data["results"]]
+        self.assertGreater(ranks[0], ranks[1])
+
+    def test_misspelled_query_falls_back_to_trigrams(self):
+        response = self.search(q="dragonn")
+
+        self.assertEqual(
+            [book["title"] for book in response.data["results"]], ["The Silent Dragon"]
+        )
+
+    def test_results_are_paginated(self):
+        response = self.search(q="shevchenko", page_size=1)
+
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIn("page=2", response.data["next"])
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.data["results"][0]["title"], "Winter River")
+        self.assertIsNone(response.data["next"])
+
+    @patch.object(BookSearchPagination, "max_results", 1)
+    def test_results_stop_at_max_results(self):
+        response = self.search(q="shevchenko", page_size=1)
+        self.assertIsNone(response.data["next"])
+
+        response = self.search(q="shevchenko", page_size=1, page=2)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_query_is_required(self):
+        response = self.search(q=" ")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
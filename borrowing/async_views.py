@@ -0,0 +1,39 @@
+from asgiref.sync import sync_to_async
+
+from borrowing.models import Borrowing
+from borrowing.serializers import BorrowingCreateSerializer
+from library_service.async_api import api_response, async_api_view
+
+
+def _create_borrowing(request, data):
+    serializer = BorrowingCreateSerializer(data=data, context={"request": request})
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    return serializer.data
+
+
+@async_api_view(["POST"])
+async def create_borrowing(request, user, data):
+    request.user = user
+    borrowing = await sync_to_async(_create_borrowing)(request, data)
+    return api_response(borrowing, status=201)
+
+
+@async_api_view(["POST"])
+async def return_borrowing(request, user, data, pk):
+    queryset = Borrowing.objects.select_related("book")
+    if not user.is_staff:
+        queryset = queryset.filter(user_id=user.id)
+
+    borrowing = await queryset.aget(pk=pk)
+    fine_payment = await sync_to_async(borrowing.return_borrowing)()
+
+    if fine_payment is not None:
+        return api_response(
+            {
+                "message": f"You have to pay {fine_payment.money_to_pay} "
+                f"for overdue borrowing."
+            }
+        )
+
+    return api_response({"message": "Book was successfully returned."})
@@ -0,0 +1,59 @@
+from django.db.models import (
+    DateField,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Func,
+    IntegerField,
+    Value,
+)
+
+FINE_MULTIPLIER = 2
+
+
+class DaysBetween(Func):
+    """
+    Whole days from ``start`` to ``end``. PostgreSQL returns an integer
+    when one date is subtracted from another.
+    """
+
+    arg_joiner = " - "
+    template = "(%(expressions)s)"
+    output_field = IntegerField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+
+def calculate_fine(expected_return_date, return_date, daily_fee):
+    """
+    Fine for a single borrowing returned on ``return_date``,
+    or None if it was returned on time.
+    """
+    overdue_days = (return_date - expected_return_date).days
+    if overdue_days <= 0:
+        return None
+
+    return overdue_days * daily_fee * FINE_MULTIPLIER
+
+
+def annotate_accrued_fines(queryset, as_of):
+    """
+    Narrow a Borrowing queryset to loans that are still out and overdue
+    on ``as_of`` and annotate ``overdue_days`` and ``accrued_fine``,
+    the fine they would be charged if returned that day. The whole
+    calculation runs in the database.
+    """
+    overdue_days = DaysBetween(
+        Value(as_of, output_field=DateField()), F("expected_return_date")
+    )
+
+    return queryset.filter(
+        actual_return_date__isnull=True, expected_return_date__lt=as_of
+    ).annotate(
+        overdue_days=overdue_days,
+        accrued_fine=ExpressionWrapper(
+            overdue_days * F("book__daily_fee") * FINE_MULTIPLIER,
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+    )
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from borrowing.models import Borrowing
+from library_service.pagination import BorrowingPagination
+from payment.models import Payment
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN ANALYZE on the hot borrowing and payment queries "
+        "and fail if any of them falls back to a sequential scan."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user-id",
+            type=int,
+            help="User to parametrize per-user queries with. "
+            "Defaults to the user with the most borrowings.",
+        )
+        parser.add_argument("--verbose-plans", action="store_true")
+
+    def get_hot_queries(self, user_id):
+        today = timezone.now().date()
+        # literal values, as the application sends them; a subquery could
+        # not be matched to the partial session index
+        session_id = (
+            Payment.objects.exclude(session_id="")
+            .values_list("session_id", flat=True)
+            .first()
+        )
+        if session_id is None:
+            raise CommandError("No payments found. Seed the database first.")
+        borrowing_id = (
+            Borrowing.objects.filter(user_id=user_id)
+            .values_list("id", flat=True)
+            .first()
+        )
+
+        return {
+            "active borrowings by user": Borrowing.objects.filter(
+                user_id=user_id, actual_return_date__isnull=True
+            ),
+            "borrowing list page": Borrowing.objects.filter(user_id=user_id).order_by(
+                *BorrowingPagination.ordering
+            )[: BorrowingPagination.page_size + 1],
+            # also the borrowing side of the accrued fines report, whose join
+            # to every overdue book is rightly a hash join over book_book
+            "overdue borrowings": Borrowing.objects.filter(
+                expected_return_date__lte=today, actual_return_date__isnull=True
+            ),
+            "pending payments by user": Payment.objects.filter(
+                borrowing__user_id=user_id, status="PENDING"
+            )[:1],
+            "payment by session": Payment.objects.filter(session_id=session_id),
+            "paid fine by borrowing": Payment.objects.filter(
+                borrowing_id=borrowing_id, type="FINE", status="PAID"
+            ),
+        }
+
+    def handle(self, *args, **options):
+        user_id = options["user_id"] or self._busiest_user_id()
+        failures = []
+
+        for name, queryset in self.get_hot_queries(user_id).items():
+            plan = queryset.explain(analyze=True)
+            seq_scan = "Seq Scan" in plan
+
+            if seq_scan:
+                failures.append(name)
+            style = self.style.ERROR if seq_scan else self.style.SUCCESS
+            self.stdout.write(style(f"{'SEQ SCAN' if seq_scan else 'OK':>8}  {name}"))
+            if options["verbose_plans"] or seq_scan:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(
+                f"Sequential scans in: {', '.join(failures)}. "
+                f"Make sure the database is seeded and analyzed."
+            )
+
+    @staticmethod
+    def _busiest_user_id():
+        busiest = (
+            Borrowing.objects.values("user_id")
+            .annotate(borrowings=Count("id"))
+            .order_by("-borrowings")
+            .first()
+        )
+        if busiest is None:
+            raise CommandError("No borrowings found. Seed the database first.")
+        return busiest["user_id"]
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent-request capacity of a running server. Run it "
+        "against `runserver` (WSGI, sync views) and against "
+        "`uvicorn library_service.asgi:application --workers 1` "
+        "(async views) to compare a single worker of each."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--path",
+            default="/api/payments/",
+            help="Use /api/payments/ for the sync views and "
+            "/api/async/payments/ for the async ones.",
+        )
+        parser.add_argument("--method", default="POST")
+        parser.add_argument("--body", default="{}", help="JSON request body.")
+        parser.add_argument("--token", required=True, help="JWT access token.")
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 200]
+        )
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        results = asyncio.run(self._run(options))
+        self.stdout.write(json.dumps(results, indent=2))
+
+    async def _run(self, options):
+        headers = {
+            "Authorize": f"Bearer {options['token']}",
+            "Content-Type": "application/json",
+        }
+        results = []
+        limits = httpx.Limits(max_connections=max(options["concurrency"]))
+
+        async with httpx.AsyncClient(
+            base_url=options["base_url"], headers=headers, limits=limits, timeout=60
+        ) as client:
+            for concurrency in options["concurrency"]:
+                semaphore = asyncio.Semaphore(concurrency)
+                latencies = []
+                errors = 0
+
+                async def call():
+                    nonlocal errors
+                    async with semaphore:
+                        started = time.perf_counter()
+                        try:
+                            response = await client.request(
+                                options["method"],
+                                options["path"],
+                                content=options["body"],
+                            )
+                            errors += response.status_code >= 500
+                        except httpx.HTTPError:
+                            errors += 1
+                        latencies.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                await asyncio.gather(*(call() for _ in range(options["requests"])))
+                elapsed = time.perf_counter() - started
+
+                percentiles = statistics.quantiles(latencies, n=100)
+                results.append(
+                    {
+                        "concurrency": concurrency,
+                        "rps": round(len(latencies) / elapsed, 1),
+                        "p50_ms": round(percentiles[49] * 1000, 2),
+                        "p99_ms": round(percentiles[98] * 1000, 2),
+                        "errors": errors,
+                    }
+                )
+
+        return results
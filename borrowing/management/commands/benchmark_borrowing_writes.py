@@ -0,0 +1,84 @@
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from book.models import Book
+from borrowing.models import Borrowing
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure Borrowing writes per second with full validation, "
+        "dirty-field validation and the trusted fast path. "
+        "All rows are rolled back afterwards."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        count = options["count"]
+
+        for mode in ("full", "dirty", "trusted"):
+            try:
+                with transaction.atomic():
+                    created, updated = self._run(mode, count)
+                    raise Rollback
+            except Rollback:
+                pass
+
+            self.stdout.write(
+                f"{mode:>8}: create {created:,.0f} writes/s, "
+                f"update {updated:,.0f} writes/s"
+            )
+
+    def _run(self, mode, count):
+        user = get_user_model().objects.create_user(
+            email="benchmark@example.com", password="benchmark"
+        )
+        book = Book.objects.create(
+            title="Benchmark Book",
+            author="Benchmark Author",
+            cover="HARD",
+            inventory=count,
+            daily_fee=1,
+        )
+        expected_return_date = date.today() + timedelta(days=7)
+
+        borrowings = []
+        started = time.perf_counter()
+        for _ in range(count):
+            borrowing = Borrowing(
+                book=book, user=user, expected_return_date=expected_return_date
+            )
+            self._save(borrowing, mode)
+            borrowings.append(borrowing)
+        create_rate = count / (time.perf_counter() - started)
+
+        borrowings = Borrowing.objects.filter(book=book)
+        started = time.perf_counter()
+        for borrowing in borrowings.iterator(chunk_size=2000):
+            borrowing.expected_return_date += timedelta(days=1)
+            self._save(borrowing, mode)
+        update_rate = count / (time.perf_counter() - started)
+
+        return create_rate, update_rate
+
+    @staticmethod
+    def _save(borrowing, mode):
+        if mode == "full":
+            # the previous save(): every validator plus a lazy book load
+            borrowing.full_clean()
+            borrowing.book.inventory
+            borrowing.save(validate=False)
+        elif mode == "dirty":
+            borrowing.save()
+        else:
+            borrowing.save(validate=False)
@@ -0,0 +1,110 @@
+import json
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from book.models import Book
+from borrowing.models import Borrowing
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare borrowing and returning a stack of books with one call "
+        "per book against the bulk endpoints. "
+        "All rows are rolled back afterwards."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=100)
+
+    def handle(self, *args, **options):
+        report = {"books": options["books"]}
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for mode in ("sequential", "bulk"):
+                try:
+                    with transaction.atomic():
+                        report[mode] = self._run(mode, options["books"])
+                        raise Rollback
+                except Rollback:
+                    pass
+
+        report["speedup"] = {
+            step: round(report["sequential"][step] / report["bulk"][step], 1)
+            for step in ("borrow_ms", "return_ms")
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _run(self, mode, count):
+        user = get_user_model().objects.create_user(
+            email="bulk-benchmark@example.com", password="benchmark"
+        )
+        book_ids = [
+            book.id
+            for book in Book.objects.bulk_create(
+                Book(
+                    title=f"Benchmark Book {i}",
+                    author="Benchmark Author",
+                    cover="HARD",
+                    inventory=1,
+                    daily_fee=1,
+                )
+                for i in range(count)
+            )
+        ]
+        expected_return_date = date.today() + timedelta(days=7)
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        started = time.perf_counter()
+        if mode == "sequential":
+            for book_id in book_ids:
+                client.post(
+                    reverse("borrowing:borrowing-list"),
+                    {"book": book_id, "expected_return_date": expected_return_date},
+                )
+        else:
+            client.post(
+                reverse("borrowing:borrowing-bulk"),
+                {
+                    "borrowings": [
+                        {"book": book_id, "expected_return_date": expected_return_date}
+                        for book_id in book_ids
+                    ]
+                },
+                format="json",
+            )
+        borrow_duration = time.perf_counter() - started
+
+        borrowing_ids = list(
+            Borrowing.objects.filter(user=user).values_list("id", flat=True)
+        )
+        started = time.perf_counter()
+        if mode == "sequential":
+            for borrowing_id in borrowing_ids:
+                client.post(
+                    reverse("borrowing:borrowing-return-book", args=[borrowing_id])
+                )
+        else:
+            client.post(
+                reverse("borrowing:borrowing-bulk-return"),
+                {"borrowings": borrowing_ids},
+                format="json",
+            )
+        return_duration = time.perf_counter() - started
+
+        return {
+            "borrow_ms": round(borrow_duration * 1000, 1),
+            "return_ms": round(return_duration * 1000, 1),
+        }
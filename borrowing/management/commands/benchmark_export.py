@@ -0,0 +1,102 @@
+import json
+import resource
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from book.models import Book
+from borrowing.models import Borrowing
+
+
+class Rollback(Exception):
+    pass
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput and peak memory of the streaming borrowing "
+        "export in CSV and NDJSON. All rows are rolled back afterwards."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000_000)
+
+    def handle(self, *args, **options):
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            try:
+                with transaction.atomic():
+                    report = self._run(options["rows"])
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _run(self, count):
+        staff = self._seed(count)
+        client = APIClient()
+        client.force_authenticate(user=staff)
+        report = {"rows": count, "baseline_rss_mb": round(max_rss_mb(), 1)}
+
+        for file_format in ("csv", "ndjson"):
+            url = reverse(
+                "borrowing:borrowing-export", kwargs={"file_format": file_format}
+            )
+            started = time.perf_counter()
+            response = client.get(url)
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            duration = time.perf_counter() - started
+
+            report[file_format] = {
+                "rows_per_second": round(count / duration),
+                "megabytes": round(size / 1024 / 1024, 1),
+                "peak_rss_mb": round(max_rss_mb(), 1),
+            }
+        return report
+
+    def _seed(self, count):
+        staff = get_user_model().objects.create_user(
+            email="export-benchmark@example.com",
+            password="benchmark",
+            is_staff=True,
+        )
+        book = Book.objects.create(
+            title="Benchmark Book",
+            author="Benchmark Author",
+            cover="HARD",
+            inventory=1,
+            daily_fee=1,
+        )
+
+        table = Borrowing._meta.db_table
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                f"(borrow_date, expected_return_date, book_id, user_id) "
+                f"SELECT %s, %s, %s, %s FROM generate_series(1, %s)",
+                [
+                    date.today(),
+                    date.today() + timedelta(days=7),
+                    book.id,
+                    staff.id,
+                    count,
+                ],
+            )
+            cursor.execute(f"ANALYZE {table}")
+        self.stderr.write(
+            f"Seeded {count:,} borrowings in {time.perf_counter() - started:.1f}s"
+        )
+        return staff
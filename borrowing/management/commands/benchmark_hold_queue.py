@@ -0,0 +1,83 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from book.models import Book
+from borrowing.models import Hold
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill one book's hold queue to several depths from the seeded "
+        "users and time allocating returned copies to its head, to show "
+        "allocation cost does not grow with the queue. "
+        "All rows are rolled back afterwards."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--depths", type=int, nargs="+", default=[100, 10_000, 500_000]
+        )
+        parser.add_argument("--allocations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(email__startswith="seed-user-")
+        if users.count() < max(options["depths"]):
+            raise CommandError("Not enough seeded users, run seed_load first.")
+
+        report = {}
+        for depth in options["depths"]:
+            try:
+                with transaction.atomic():
+                    report[depth] = self._run(depth, options["allocations"])
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _run(self, depth, allocations):
+        book = Book.objects.create(
+            title="Hold Benchmark Book",
+            author="Benchmark Author",
+            cover="HARD",
+            inventory=0,
+            daily_fee=1,
+        )
+        user_table = get_user_model()._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {Hold._meta.db_table} (book_id, user_id, status, "
+                f"created_at) SELECT %s, id, 'WAITING', "
+                f"now() + row_number() OVER (ORDER BY id) * interval '1 ms' "
+                f"FROM {user_table} WHERE email LIKE 'seed-user-%%' "
+                f"ORDER BY id LIMIT %s",
+                [book.id, depth],
+            )
+            cursor.execute(f"ANALYZE {Hold._meta.db_table}")
+
+        latencies = []
+        for _ in range(allocations):
+            started = time.perf_counter()
+            with transaction.atomic():
+                Book.objects.select_for_update().filter(pk=book.pk).exists()
+                Hold.allocate({book.id: 1})
+            latencies.append(time.perf_counter() - started)
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        head = Hold.objects.filter(book=book, status="WAITING").order_by(
+            "created_at", "id"
+        )[:1]
+        return {
+            "p50_ms": round(percentiles[49] * 1000, 3),
+            "p99_ms": round(percentiles[98] * 1000, 3),
+            "head_plan": head.explain(analyze=True).splitlines(),
+        }
@@ -0,0 +1,88 @@
+import io
+import json
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from book.models import Book
+from borrowing.models import Borrowing
+from borrowing.serializers import BorrowingListSerializer
+from library_service.parsers import ORJSONParser
+from library_service.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare encode and parse throughput of the stdlib and orjson "
+        "renderers on BorrowingListSerializer pages. Needs no database."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=500)
+        parser.add_argument("--pages", type=int, default=200)
+
+    def handle(self, *args, **options):
+        page = {"next": None, "results": self._page(options["page_size"])}
+        pages = options["pages"]
+
+        expected = JSONRenderer().render(page)
+        if ORJSONRenderer().render(page) != expected:
+            raise CommandError("orjson output differs from JSONRenderer.")
+
+        report = {
+            "page_size": options["page_size"],
+            "page_kb": round(len(expected) / 1024, 1),
+        }
+        for name, renderer, parser in (
+            ("stdlib", JSONRenderer(), JSONParser()),
+            ("orjson", ORJSONRenderer(), ORJSONParser()),
+        ):
+            started = time.perf_counter()
+            for _ in range(pages):
+                renderer.render(page)
+            encode = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for _ in range(pages):
+                parser.parse(io.BytesIO(expected))
+            parse = time.perf_counter() - started
+
+            report[name] = {
+                "encode_pages_per_second": round(pages / encode, 1),
+                "encode_mb_per_second": round(
+                    pages * len(expected) / encode / 1024 / 1024, 1
+                ),
+                "parse_pages_per_second": round(pages / parse, 1),
+            }
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    def _page(size):
+        user = get_user_model()(email="renderer-benchmark@example.com")
+        book = Book(
+            title="Benchmark Book — «Œuvres complètes»",
+            author="Benchmark Author",
+            cover="HARD",
+            inventory=1,
+            daily_fee=1,
+        )
+        borrow_date = date.today() - timedelta(days=30)
+        borrowings = [
+            Borrowing(
+                id=i,
+                book=book,
+                user=user,
+                borrow_date=borrow_date,
+                expected_return_date=borrow_date + timedelta(days=14),
+                actual_return_date=(
+                    borrow_date + timedelta(days=10) if i % 2 else None
+                ),
+            )
+            for i in range(1, size + 1)
+        ]
+        return BorrowingListSerializer(borrowings, many=True).data
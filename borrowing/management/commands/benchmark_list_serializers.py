@@ -0,0 +1,123 @@
+import json
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from book.models import Book
+from borrowing.models import Borrowing
+from borrowing.serializers import (
+    BorrowingDetailSerializer,
+    BorrowingDetailValuesSerializer,
+    BorrowingListSerializer,
+    BorrowingListValuesSerializer,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows per second of the model list/detail serializers "
+        "with their values()-based twins and check that both render the "
+        "same JSON. All rows are rolled back afterwards."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50_000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                report = self._run(options["rows"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _run(self, count, repeat):
+        self._seed(count)
+        queryset = Borrowing.objects.select_related("book", "user").order_by("id")
+        renderer = JSONRenderer()
+        report = {"rows": count}
+
+        for name, serializer_class, values_serializer_class in (
+            ("list", BorrowingListSerializer, BorrowingListValuesSerializer),
+            ("detail", BorrowingDetailSerializer, BorrowingDetailValuesSerializer),
+        ):
+            instances = list(queryset)
+            rows = list(values_serializer_class.prepare_queryset(queryset))
+
+            expected = renderer.render(serializer_class(instances, many=True).data)
+            actual = renderer.render(values_serializer_class(rows, many=True).data)
+            if actual != expected:
+                raise CommandError(f"{name}: values serializer output differs.")
+
+            report[name] = {
+                "serializer_rows_per_second": self._rate(
+                    lambda: serializer_class(instances, many=True).data,
+                    count,
+                    repeat,
+                ),
+                "values_rows_per_second": self._rate(
+                    lambda: values_serializer_class(rows, many=True).data,
+                    count,
+                    repeat,
+                ),
+                "serializer_with_fetch_rows_per_second": self._rate(
+                    lambda: serializer_class(list(queryset), many=True).data,
+                    count,
+                    repeat,
+                ),
+                "values_with_fetch_rows_per_second": self._rate(
+                    lambda: values_serializer_class(
+                        list(values_serializer_class.prepare_queryset(queryset)),
+                        many=True,
+                    ).data,
+                    count,
+                    repeat,
+                ),
+            }
+        return report
+
+    @staticmethod
+    def _rate(serialize, count, repeat):
+        best = min(Command._time(serialize) for _ in range(repeat))
+        return round(count / best)
+
+    @staticmethod
+    def _time(serialize):
+        started = time.perf_counter()
+        serialize()
+        return time.perf_counter() - started
+
+    @staticmethod
+    def _seed(count):
+        user = get_user_model().objects.create_user(
+            email="serializer-benchmark@example.com", password="benchmark"
+        )
+        book = Book.objects.create(
+            title="Benchmark Book",
+            author="Benchmark Author",
+            cover="HARD",
+            inventory=count,
+            daily_fee=1,
+        )
+        Borrowing.objects.bulk_create(
+            (
+                Borrowing(
+                    book=book,
+                    user=user,
+                    expected_return_date=date.today() + timedelta(days=7),
+                )
+                for _ in range(count)
+            ),
+            batch_size=5000,
+        )
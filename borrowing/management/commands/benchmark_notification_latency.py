@@ -0,0 +1,115 @@
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from book.models import Book
+from borrowing.models import NotificationOutbox
+from borrowing.tasks import relay_notification_outbox
+from telegram_client import TelegramClient
+
+
+class Rollback(Exception):
+    pass
+
+
+class SlowTelegramHandler(BaseHTTPRequestHandler):
+    delay = 0.5
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.delay)
+        payload = b'{"ok": true, "result": {}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare POST /api/borrowings/ latency with inline Telegram delivery "
+        "and with the outbox, against a deliberately slow fake bot."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--bot-delay", type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        SlowTelegramHandler.delay = options["bot_delay"]
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SlowTelegramHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        telegram = TelegramClient(
+            "benchmark", base_url=f"http://127.0.0.1:{server.server_port}"
+        )
+
+        def send_inline(message):
+            telegram.send_message(message, chat_id="1")
+            return NotificationOutbox(message=message)
+
+        try:
+            with patch("borrowing.tasks.get_telegram_client", return_value=telegram):
+                with patch.object(NotificationOutbox, "enqueue", send_inline):
+                    self._report("inline", self._run(options["requests"]))
+                self._report("outbox", self._run(options["requests"]))
+        finally:
+            telegram.close()
+            server.shutdown()
+
+    def _run(self, count):
+        latencies = []
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(
+                    email="benchmark@example.com", password="benchmark"
+                )
+                book = Book.objects.create(
+                    title="Benchmark Book",
+                    author="Benchmark Author",
+                    cover="HARD",
+                    inventory=count,
+                    daily_fee=1,
+                )
+                client = APIClient()
+                client.force_authenticate(user=user)
+                url = reverse("borrowing:borrowing-list")
+                data = {
+                    "book": book.id,
+                    "expected_return_date": date.today() + timedelta(days=7),
+                }
+
+                for _ in range(count):
+                    started = time.perf_counter()
+                    client.post(url, data)
+                    latencies.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                relay_notification_outbox()
+                drain = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+
+        return latencies, drain
+
+    def _report(self, mode, result):
+        latencies, drain = result
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{mode:>6}: p50 {percentiles[49] * 1000:.1f} ms, "
+            f"p99 {percentiles[98] * 1000:.1f} ms, "
+            f"outbox drain {drain:.2f} s"
+        )
@@ -0,0 +1,76 @@
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from book.models import Book
+from borrowing.models import Borrowing
+from library_service.pagination import BorrowingPagination
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed borrowings if needed and time GET /api/borrowings/ "
+        "at increasing page depths."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5_000_000)
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        staff = self._seed(options["rows"])
+        client = APIClient()
+        client.force_authenticate(user=staff)
+        url = reverse("borrowing:borrowing-list")
+        page_size = options["page_size"]
+        paginator = BorrowingPagination()
+
+        for page in (1, 10, 1_000, 10_000, options["rows"] // page_size - 1):
+            offset = (page - 1) * page_size
+            params = {"page_size": page_size}
+            if offset:
+                position = Borrowing.objects.order_by(*paginator.ordering).values_list(
+                    *paginator.ordering
+                )[offset - 1]
+                params["cursor"] = paginator.encode_cursor(position)
+
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                client.get(url, params)
+            elapsed = (time.perf_counter() - started) / options["repeat"]
+
+            self.stdout.write(f"page {page:>9,}: {elapsed * 1000:.1f} ms")
+
+    def _seed(self, rows):
+        staff, _ = get_user_model().objects.get_or_create(
+            email="benchmark-staff@example.com", defaults={"is_staff": True}
+        )
+        missing = rows - Borrowing.objects.count()
+        if missing <= 0:
+            return staff
+
+        self.stdout.write(f"Seeding {missing:,} borrowings...")
+        book = Book.objects.create(
+            title="Benchmark Book",
+            author="Benchmark Author",
+            cover="HARD",
+            inventory=1,
+            daily_fee=1,
+        )
+        start = date.today()
+        batch_size = 10_000
+        for batch_start in range(0, missing, batch_size):
+            Borrowing.objects.bulk_create(
+                Borrowing(
+                    book=book,
+                    user=staff,
+                    expected_return_date=start + timedelta(days=index // 2_000),
+                )
+                for index in range(batch_start, min(batch_start + batch_size, missing))
+            )
+        return staff
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing", "0005_hold"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="next_attempt_at",
+            field=models.DateTimeField(
+                blank=True, default=django.utils.timezone.now, null=True
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="notificationoutbox",
+            name="outbox_pending_idx",
+        ),
+        migrations.AddIndex(
+            model_name="notificationoutbox",
+            index=models.Index(
+                condition=models.Q(
+                    ("sent_at__isnull", True), ("next_attempt_at__isnull", False)
+                ),
+                fields=["next_attempt_at"],
+                name="outbox_due_idx",
+            ),
+        ),
+    ]
@@ -1,12 +1,16 @@
+from collections import Counter
 from datetime import date
 
 from django.apps import apps
 from django.conf import settings
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, When
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
+from book.cache import get_availability, get_books, invalidate_availability
 from book.models import Book
+from borrowing.fines import calculate_fine
 
 
 class Borrowing(models.Model):
@@ -24,12 +28,72 @@ class Borrowing(models.Model):
         related_name="borrowings",
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["borrow_date", "id"], name="borrowing_borrow_date_id_idx"
+            ),
+            models.Index(
+                fields=["user", "borrow_date", "id"],
+                name="borrowing_user_borrow_date_idx",
+            ),
+            models.Index(
+                fields=["user"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_active_user_idx",
+            ),
+            models.Index(
+                fields=["expected_return_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_overdue_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return (
             f"Book: {self.book.title}, Author: {self.book.author}. "
             f"Borrowed from {self.borrow_date} to {self.expected_return_date}."
         )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_dirty_fields(self) -> set[str]:
+        """
+        Return attnames of fields changed since the row was loaded.
+        Unsaved instances report every concrete field as dirty.
+        """
+        fields = self._meta.concrete_fields
+        if self._state.adding:
+            return {field.attname for field in fields}
+
+        loaded_values = getattr(self, "_loaded_values", {})
+        return {
+            field.attname
+            for field in fields
+            if field.attname in loaded_values
+            and getattr(self, field.attname) != loaded_values[field.attname]
+        }
+
+    def _get_book_inventory(self) -> int:
+        if Borrowing.book.is_cached(self):
+            return self.book.inventory
+        if settings.BOOK_CACHE_ENABLED:
+            return get_availability(self.book_id)
+
+        return Book.objects.values_list("inventory", flat=True).get(pk=self.book_id)
+
+    def _get_book_title(self) -> str:
+        if Borrowing.book.is_cached(self):
+            return self.book.title
+        if settings.BOOK_CACHE_ENABLED:
+            return get_books([self.book_id])[self.book_id]["title"]
+
+        return Book.objects.values_list("title", flat=True).get(pk=self.book_id)
+
     def clean(self):
         if self.borrow_date is None:
             self.borrow_date = timezone.now().date()
@@ -44,34 +108,353 @@ class Borrowing(models.Model):
                 "Expected return date cannot be earlier than the borrow date."
             )
 
-        if self.book.inventory <= 0:
+        if (
+            "book_id" in self.get_dirty_fields()
+            and self._get_book_inventory() <= 0
+            and not Hold.is_ready(self.book_id, self.user_id)
+        ):
             raise ValidationError(
-                f"The book '{self.book.title}' is not available for borrowing."
+                f"The book '{self._get_book_title()}' is not available for borrowing."
             )
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, validate=True, **kwargs):
+        """
+        Validate only the fields that changed since load before saving.
+        Pass ``validate=False`` for trusted internal writes that were
+        already checked by the caller.
+        """
         if not self.borrow_date:
             self.borrow_date = date.today()
 
-        self.full_clean()
+        if validate:
+            dirty_fields = self.get_dirty_fields()
+            if dirty_fields:
+                self.full_clean(
+                    exclude=[
+                        field.name
+                        for field in self._meta.concrete_fields
+                        if field.attname not in dirty_fields
+                    ],
+                    validate_unique=False,
+                )
+
         super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+        }
 
     def return_borrowing(self):
+        """
+        Close the borrowing, hand the copy to the next hold on the book or
+        put it back on the shelf, and charge a fine if the book is overdue.
+        Returns the fine payment, if any.
+        """
         if self.actual_return_date is not None:
             raise ValidationError("The book is already returned.")
 
-        self.actual_return_date = timezone.now().date()
-        self.book.inventory += 1
-        self.save()
+        return_date = timezone.now().date()
+
+        with transaction.atomic():
+            returned = Borrowing.objects.filter(
+                pk=self.pk, actual_return_date__isnull=True
+            ).update(actual_return_date=return_date)
+            if not returned:
+                raise ValidationError("The book is already returned.")
+
+            Book.objects.filter(pk=self.book_id).update(inventory=F("inventory") + 1)
+            if Hold.allocate({self.book_id: 1}):
+                Book.objects.filter(pk=self.book_id).update(
+                    inventory=F("inventory") - 1
+                )
+            invalidate_availability([self.book_id])
+            self.actual_return_date = return_date
 
-        if self.actual_return_date > self.expected_return_date:
-            overdue_days = (self.actual_return_date - self.expected_return_date).days
-            fine_amount = overdue_days * self.book.daily_fee * 2
+            fine_amount = self.get_fine_amount()
+            if fine_amount is None:
+                return None
 
             payment = apps.get_model("payment", "Payment")
-            payment.objects.create(
+            return payment.objects.create(
                 borrowing=self,
                 money_to_pay=fine_amount,
                 status="PENDING",
                 type="FINE",
             )
+
+    def get_fine_amount(self):
+        """
+        Fine owed for returning the book on ``actual_return_date``,
+        or None if it is not returned yet or was returned on time.
+        """
+        if self.actual_return_date is None:
+            return None
+
+        return calculate_fine(
+            self.expected_return_date, self.actual_return_date, self.book.daily_fee
+        )
+
+    @classmethod
+    def return_many(cls, borrowings) -> dict:
+        """
+        Close a batch of open borrowings with one update per table and
+        charge all fines in one insert. The caller must hold row locks on
+        the borrowings. Returns fine payments keyed by borrowing id.
+        """
+        payment = apps.get_model("payment", "Payment")
+        counter = apps.get_model("payment", "PendingPaymentCounter")
+        return_date = timezone.now().date()
+
+        with transaction.atomic(savepoint=False):
+            # lock books in primary key order so concurrent batches
+            # cannot deadlock on each other
+            books = (
+                Book.objects.select_for_update()
+                .filter(pk__in={borrowing.book_id for borrowing in borrowings})
+                .order_by("pk")
+                .in_bulk()
+            )
+            copies = Counter(borrowing.book_id for borrowing in borrowings)
+            allocated = Hold.allocate(copies)
+            for book_id, count in copies.items():
+                books[book_id].inventory += count - allocated[book_id]
+            Book.objects.bulk_update(books.values(), ["inventory"])
+            invalidate_availability(books)
+
+            fines = {}
+            for borrowing in borrowings:
+                borrowing.book = books[borrowing.book_id]
+                borrowing.actual_return_date = return_date
+                fine_amount = borrowing.get_fine_amount()
+                if fine_amount is not None:
+                    fines[borrowing.id] = payment(
+                        borrowing=borrowing,
+                        money_to_pay=fine_amount,
+                        status="PENDING",
+                        type="FINE",
+                    )
+            cls.objects.bulk_update(borrowings, ["actual_return_date"])
+
+            # bulk_create skips Payment.save, so settle the counters here
+            payment.objects.bulk_create(fines.values())
+            for user_id, count in Counter(
+                fine.borrowing.user_id for fine in fines.values()
+            ).items():
+                counter.increment(user_id, by=count)
+
+        return fines
+
+
+class Hold(models.Model):
+    """
+    A user's place in the queue for a book that is out of stock. Waiting
+    holds are served first come, first served; a served hold keeps a copy
+    aside until ``expires_at``.
+    """
+
+    STATUS_CHOICES = (
+        ("WAITING", "Waiting"),
+        ("READY", "Ready for pickup"),
+        ("FULFILLED", "Fulfilled"),
+        ("EXPIRED", "Expired"),
+        ("CANCELLED", "Cancelled"),
+    )
+    ACTIVE_STATUSES = ("WAITING", "READY")
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="holds")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="holds"
+    )
+    status = models.CharField(max_length=9, choices=STATUS_CHOICES, default="WAITING")
+    created_at = models.DateTimeField(auto_now_add=True)
+    ready_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the per-book queue: the next hold is one index descent
+            models.Index(
+                fields=["book", "created_at", "id"],
+                condition=models.Q(status="WAITING"),
+                name="hold_queue_idx",
+            ),
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(status="READY"),
+                name="hold_ready_expires_at_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "user"],
+                condition=models.Q(status__in=("WAITING", "READY")),
+                name="hold_active_book_user_unique",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Hold {self.id} - {self.status}"
+
+    @classmethod
+    def annotate_position(cls, queryset):
+        """
+        Annotate waiting holds with their 1-based place in the book's
+        queue; other holds get None.
+        """
+        ahead = (
+            cls.objects.filter(book_id=OuterRef("book_id"), status="WAITING")
+            .filter(
+                Q(created_at__lt=OuterRef("created_at"))
+                | Q(created_at=OuterRef("created_at"), id__lte=OuterRef("id"))
+            )
+            .order_by()
+            .values("book_id")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return queryset.annotate(
+            position=Case(When(status="WAITING", then=Subquery(ahead)))
+        )
+
+    @classmethod
+    def allocate(cls, copies) -> Counter:
+        """
+        Hand returned copies, given as ``{book_id: count}``, to the oldest
+        waiting holds of each book and queue a pickup notification per
+        hold. The caller must hold the row locks of the books. Returns the
+        number of copies allocated per book; the rest belong on the shelf.
+        """
+        hold = cls._meta.db_table
+        user = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+        book = Book._meta.db_table
+        ready_at = timezone.now()
+        expires_at = ready_at + settings.HOLD_PICKUP_WINDOW
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH next AS ("
+                f"SELECT queued.id FROM unnest(%s::bigint[], %s::integer[]) "
+                f"AS returned (book_id, copies) CROSS JOIN LATERAL ("
+                f"SELECT {hold}.id FROM {hold} "
+                f"WHERE {hold}.book_id = returned.book_id "
+                f"AND {hold}.status = 'WAITING' "
+                f"ORDER BY {hold}.created_at, {hold}.id "
+                f"LIMIT returned.copies FOR UPDATE"
+                f") AS queued) "
+                f"UPDATE {hold} SET status = 'READY', ready_at = %s, expires_at = %s "
+                f"FROM next, {user}, {book} "
+                f"WHERE {hold}.id = next.id "
+                f"AND {hold}.user_id = {user}.id "
+                f"AND {hold}.book_id = {book}.id "
+                f"RETURNING {hold}.id, {hold}.book_id, {user}.email, {book}.title",
+                [list(copies), list(copies.values()), ready_at, expires_at],
+            )
+            allocated = cursor.fetchall()
+
+        if allocated:
+            NotificationOutbox.objects.bulk_create(
+                NotificationOutbox(
+                    message=(
+                        f"Hold Ready For Pickup:\n"
+                        f"*Hold ID: {hold_id}\n"
+                        f"*Book title: {title}\n"
+                        f"*User email: {email}\n"
+                        f"*Pick up before: {expires_at:%Y-%m-%d %H:%M}\n"
+                    )
+                )
+                for hold_id, _, email, title in allocated
+            )
+        return Counter(book_id for _, book_id, _, _ in allocated)
+
+    @classmethod
+    def pass_on(cls, copies) -> None:
+        """
+        Give the copies of cancelled or expired ready holds to the next
+        holds in line, and put whatever is left back on the shelf.
+        """
+        with transaction.atomic(savepoint=False):
+            # lock books in primary key order so concurrent callers
+            # cannot deadlock on each other
+            books = (
+                Book.objects.select_for_update()
+                .filter(pk__in=copies)
+                .order_by("pk")
+                .in_bulk()
+            )
+            allocated = cls.allocate(copies)
+            for book_id, count in copies.items():
+                books[book_id].inventory += count - allocated[book_id]
+            Book.objects.bulk_update(books.values(), ["inventory"])
+            invalidate_availability(books)
+
+    def cancel(self) -> None:
+        """
+        Leave the queue. A ready hold's copy goes to the next hold in line.
+        """
+        with transaction.atomic():
+            status = (
+                Hold.objects.select_for_update()
+                .values_list("status", flat=True)
+                .get(pk=self.pk)
+            )
+            if status not in self.ACTIVE_STATUSES:
+                raise ValidationError("This hold is no longer active.")
+
+            Hold.objects.filter(pk=self.pk).update(status="CANCELLED")
+            if status == "READY":
+                Hold.pass_on({self.book_id: 1})
+
+        self.status = "CANCELLED"
+
+    @classmethod
+    def is_ready(cls, book_id, user_id) -> bool:
+        return cls.objects.filter(
+            book_id=book_id,
+            user_id=user_id,
+            status="READY",
+            expires_at__gt=timezone.now(),
+        ).exists()
+
+    @classmethod
+    def consume(cls, book_id, user_id) -> bool:
+        """
+        Turn the user's ready hold on the book into a borrowing. Returns
+        False if there is no ready hold or it has expired.
+        """
+        return bool(
+            cls.objects.filter(
+                book_id=book_id,
+                user_id=user_id,
+                status="READY",
+                expires_at__gt=timezone.now(),
+            ).update(status="FULFILLED")
+        )
+
+
+class NotificationOutbox(models.Model):
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    # Null once delivery is given up on
+    next_attempt_at = models.DateTimeField(null=True, blank=True, default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(sent_at__isnull=True, next_attempt_at__isnull=False),
+                name="outbox_due_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Notification {self.id} - {'sent' if self.sent_at else 'pending'}"
+
+    @classmethod
+    def enqueue(cls, message: str) -> "NotificationOutbox":
+        """
+        Store a notification to be relayed to Telegram. Call it inside the
+        transaction that writes the data the message is about.
+        """
+        return cls.objects.create(message=message)
@@ -22,3 +22,45 @@ borrowing_list_schema = extend_schema_view(
         ]
     )
 )
+
+as_of_parameter = OpenApiParameter(
+    name="as_of",
+    type=OpenApiTypes.DATE,
+    location=OpenApiParameter.QUERY,
+    description="Day to accrue fines up to. Defaults to today. Example: 2024-11-01",
+    required=False,
+)
+
+accrued_fines_schema = extend_schema(
+    description="Staff only. Number of overdue active borrowings and the total fine they would be charged if returned on the given day",
+    parameters=[as_of_parameter],
+    responses={200: OpenApiTypes.OBJECT},
+)
+
+accrued_fines_export_schema = extend_schema(
+    description="Staff only. CSV of overdue active borrowings with the fine each would be charged if returned on the given day",
+    parameters=[as_of_parameter],
+    responses={(200, "text/csv"): OpenApiTypes.STR},
+)
+
+borrowing_export_schema = extend_schema(
+    description="Stream the borrowings visible to the user as CSV or NDJSON. Accepts the same filters as the list",
+    parameters=[
+        OpenApiParameter(
+            name="is_active",
+            type=OpenApiTypes.BOOL,
+            location=OpenApiParameter.QUERY,
+            required=False,
+        ),
+        OpenApiParameter(
+            name="user_id",
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+        ),
+    ],
+    responses={
+        (200, "text/csv"): OpenApiTypes.STR,
+        (200, "application/x-ndjson"): OpenApiTypes.STR,
+    },
+)
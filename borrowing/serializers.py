@@ -1,7 +1,18 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
 
-from borrowing.models import Borrowing
-from payment.models import Payment
+from book.cache import get_books, invalidate_availability
+from book.models import Book
+from borrowing.models import Borrowing, Hold, NotificationOutbox
+from library_service.values_serializers import ValuesSerializer, iso_date
+from payment.models import PendingPaymentCounter
+
+BULK_MAX_ITEMS = 200
 
 
 class BorrowingSerializer(serializers.ModelSerializer):
@@ -55,6 +66,66 @@ class BorrowingDetailSerializer(BorrowingSerializer):
         )
 
 
+class CachedBookValuesMixin:
+    """
+    Fill the ``book__*`` columns of values() rows from the book cache
+    instead of joining the book table.
+    """
+
+    @classmethod
+    def prepare_queryset(cls, queryset):
+        if not settings.BOOK_CACHE_ENABLED:
+            return super().prepare_queryset(queryset)
+
+        lookups = [
+            lookup for _, lookup, _ in cls.fields if not lookup.startswith("book__")
+        ]
+        return queryset.values(*dict.fromkeys(["book_id", *lookups]))
+
+    def to_representation(self, instance):
+        rows = list(instance) if self.many else [instance]
+        if rows and "book_id" in rows[0]:
+            books = get_books({row["book_id"] for row in rows})
+            for row in rows:
+                for field, value in books[row["book_id"]].items():
+                    row[f"book__{field}"] = value
+
+        return super().to_representation(rows if self.many else instance)
+
+
+class BorrowingListValuesSerializer(CachedBookValuesMixin, ValuesSerializer):
+    """
+    values()-based twin of BorrowingListSerializer with identical output.
+    """
+
+    fields = (
+        ("id", "id", None),
+        ("book", "book__title", str),
+        ("author", "book__author", str),
+        ("user", "user__email", str),
+        ("borrow_date", "borrow_date", iso_date),
+        ("expected_return_date", "expected_return_date", iso_date),
+        ("actual_return_date", "actual_return_date", iso_date),
+    )
+
+
+class BorrowingDetailValuesSerializer(CachedBookValuesMixin, ValuesSerializer):
+    """
+    values()-based twin of BorrowingDetailSerializer with identical output.
+    """
+
+    fields = (
+        ("id", "id", None),
+        ("book", "book__title", str),
+        ("author", "book__author", str),
+        ("cover", "book__cover", str),
+        ("borrow_date", "borrow_date", iso_date),
+        ("daily_fee", "book__daily_fee", int),
+        ("expected_return_date", "expected_return_date", iso_date),
+        ("actual_return_date", "actual_return_date", iso_date),
+    )
+
+
 class BorrowingCreateSerializer(BorrowingSerializer):
     class Meta:
         model = Borrowing
@@ -72,15 +143,14 @@ class BorrowingCreateSerializer(BorrowingSerializer):
 
     def validate(self, attrs):
         book = attrs["book"]
+        user_id = self.context["request"].user.id
 
-        if book.inventory <= 0:
+        if book.inventory <= 0 and not Hold.is_ready(book.pk, user_id):
             raise serializers.ValidationError(
-                "This book is not currently available for borrowing."
+                "This book is not currently available for borrowing. "
+                "Place a hold to join the queue."
             )
-        if Payment.objects.filter(
-            borrowing__user=self.context["request"].user,
-            status="PENDING",
-        ).exists():
+        if PendingPaymentCounter.has_pending(user_id):
             raise serializers.ValidationError(
                 "You have a pending payment. Complete the payment before borrowing a new book."
             )
@@ -90,21 +160,246 @@ class BorrowingCreateSerializer(BorrowingSerializer):
     def create(self, validated_data):
         user = self.context["request"].user
         book = validated_data["book"]
-        book.inventory -= 1
-        book.save()
 
-        return Borrowing.objects.create(user=user, **validated_data)
+        with transaction.atomic():
+            borrowing = Borrowing.objects.create(user_id=user.id, **validated_data)
+            # a copy kept aside by a ready hold is not counted in inventory,
+            # so the user's hold is used up before a shelf copy is taken
+            if not Hold.consume(book.pk, user.id):
+                reserved = Book.objects.filter(pk=book.pk, inventory__gt=0).update(
+                    inventory=F("inventory") - 1
+                )
+                if not reserved:
+                    raise serializers.ValidationError(
+                        "This book is not currently available for borrowing."
+                    )
+                invalidate_availability([book.pk])
+            NotificationOutbox.enqueue(
+                f"New Borrowing Created:\n"
+                f"*ID: {borrowing.id}\n"
+                f"*Book title: {book.title}\n"
+                f"*User email: {user.email}\n"
+                f"*Borrow Date: {borrowing.borrow_date}\n"
+                f"*Expected Return Date: {borrowing.expected_return_date}\n"
+            )
+
+        return borrowing
+
+
+class BorrowingBulkItemSerializer(serializers.Serializer):
+    book = serializers.IntegerField(min_value=1)
+    expected_return_date = serializers.DateField()
+
+    def validate_expected_return_date(self, value):
+        if value < timezone.now().date():
+            raise serializers.ValidationError(
+                "Expected return date cannot be set up earlier than the borrow date."
+            )
+        return value
+
+
+class BorrowingBulkCreateSerializer(serializers.Serializer):
+    borrowings = BorrowingBulkItemSerializer(
+        many=True, allow_empty=False, max_length=BULK_MAX_ITEMS
+    )
+
+    def validate(self, attrs):
+        if PendingPaymentCounter.has_pending(self.context["request"].user.id):
+            raise serializers.ValidationError(
+                "You have a pending payment. Complete the payment before borrowing a new book."
+            )
+
+        return attrs
+
+    def create(self, validated_data):
+        user = self.context["request"].user
+        items = validated_data["borrowings"]
+        results = []
+        created = []
+
+        with transaction.atomic():
+            requested = {item["book"] for item in items}
+            # copies set aside by the user's ready holds are taken first;
+            # holds are locked before books, the same order as
+            # Hold.consume, Hold.cancel and expire_holds
+            held = dict(
+                Hold.objects.select_for_update()
+                .filter(
+                    user_id=user.id,
+                    book_id__in=requested,
+                    status="READY",
+                    expires_at__gt=timezone.now(),
+                )
+                .order_by("pk")
+                .values_list("book_id", "id")
+            )
+            # lock books in primary key order so concurrent batches
+            # cannot deadlock on each other
+            books = (
+                Book.objects.select_for_update()
+                .filter(pk__in=requested)
+                .order_by("pk")
+                .in_bulk()
+            )
+            consumed = []
+            reserved = Counter()
+
+            for item in items:
+                result = {"book": item["book"]}
+                results.append(result)
+                book = books.get(item["book"])
+
+                if book is None:
+                    result["error"] = "Book not found."
+                    continue
+
+                if book.pk in held:
+                    consumed.append(held.pop(book.pk))
+                elif book.inventory > reserved[book.pk]:
+                    reserved[book.pk] += 1
+                else:
+                    result["error"] = (
+                        f"The book '{book.title}' is not available for borrowing."
+                    )
+                    continue
+                borrowing = Borrowing(
+                    user_id=user.id,
+                    book=book,
+                    expected_return_date=item["expected_return_date"],
+                )
+                created.append((result, borrowing))
+
+            if consumed:
+                Hold.objects.filter(id__in=consumed).update(status="FULFILLED")
+            if reserved:
+                for book_id, count in reserved.items():
+                    books[book_id].inventory -= count
+                Book.objects.bulk_update(
+                    [books[book_id] for book_id in reserved], ["inventory"]
+                )
+                invalidate_availability(reserved)
+            if created:
+                Borrowing.objects.bulk_create([borrowing for _, borrowing in created])
+                NotificationOutbox.objects.bulk_create(
+                    NotificationOutbox(
+                        message=(
+                            f"New Borrowing Created:\n"
+                            f"*ID: {borrowing.id}\n"
+                            f"*Book title: {borrowing.book.title}\n"
+                            f"*User email: {user.email}\n"
+                            f"*Borrow Date: {borrowing.borrow_date}\n"
+                            f"*Expected Return Date: {borrowing.expected_return_date}\n"
+                        )
+                    )
+                    for _, borrowing in created
+                )
+
+        for result, borrowing in created:
+            result["id"] = borrowing.id
+        return results
+
+
+class BorrowingBulkReturnSerializer(serializers.Serializer):
+    borrowings = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+    def validate_borrowings(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Borrowings must not repeat.")
+        return value
+
+    def create(self, validated_data):
+        ids = validated_data["borrowings"]
+
+        with transaction.atomic():
+            borrowings = (
+                validated_data["queryset"]
+                .filter(pk__in=ids)
+                .select_for_update()
+                .order_by("pk")
+                .in_bulk()
+            )
+            open_borrowings = [
+                borrowing
+                for borrowing in borrowings.values()
+                if borrowing.actual_return_date is None
+            ]
+            fines = Borrowing.return_many(open_borrowings) if open_borrowings else {}
+
+        returned = {borrowing.id for borrowing in open_borrowings}
+        results = []
+        for borrowing_id in ids:
+            result = {"id": borrowing_id}
+            if borrowing_id not in borrowings:
+                result["error"] = "Borrowing not found."
+            elif borrowing_id not in returned:
+                result["error"] = "The book is already returned."
+            else:
+                fine = fines.get(borrowing_id)
+                result["fine"] = fine.money_to_pay if fine else None
+            results.append(result)
+        return results
 
 
 class BorrowingReturnSerializer(serializers.ModelSerializer):
     class Meta:
         model = Borrowing
         fields = ("id", "actual_return_date")
+        read_only_fields = ("actual_return_date",)
 
     def update(self, instance, validated_data):
-        instance.actual_return_date = validated_data.get(
-            "actual_return_date", instance.actual_return_date
-        )
-        instance.return_borrowing()
-        instance.save()
+        self.fine_payment = instance.return_borrowing()
         return instance
+
+
+class HoldSerializer(serializers.ModelSerializer):
+    position = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Hold
+        fields = (
+            "id",
+            "book",
+            "status",
+            "position",
+            "created_at",
+            "ready_at",
+            "expires_at",
+        )
+        read_only_fields = ("status", "created_at", "ready_at", "expires_at")
+
+    def validate(self, attrs):
+        if PendingPaymentCounter.has_pending(self.context["request"].user.id):
+            raise serializers.ValidationError(
+                "You have a pending payment. "
+                "Complete the payment before placing a hold."
+            )
+
+        return attrs
+
+    def create(self, validated_data):
+        user_id = self.context["request"].user.id
+
+        with transaction.atomic():
+            # the book row lock orders holds against returns, so a copy
+            # cannot come back unseen between the check and the insert
+            book = Book.objects.select_for_update().get(pk=validated_data["book"].pk)
+            if book.inventory > 0:
+                raise serializers.ValidationError(
+                    "This book is available, borrow it instead of placing a hold."
+                )
+            if Hold.objects.filter(
+                book=book, user_id=user_id, status__in=Hold.ACTIVE_STATUSES
+            ).exists():
+                raise serializers.ValidationError(
+                    "You already have an active hold on this book."
+                )
+
+            hold = Hold.objects.create(book=book, user_id=user_id)
+            # the new hold is last in line
+            hold.position = Hold.objects.filter(book=book, status="WAITING").count()
+
+        return hold
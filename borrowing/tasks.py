@@ -1,37 +1,229 @@
-from celery import shared_task
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from celery import group, shared_task
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
-from borrowing.models import Borrowing
-import requests
-import os
-from dotenv import load_dotenv
+from borrowing.models import Borrowing, Hold, NotificationOutbox
+from telegram_client import TelegramDeliveryError, get_telegram_client
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+OVERDUE_CHUNK_SIZE = 2000
+OVERDUE_SEND_GROUP_SIZE = 20
+# At the group chat rate of 20 messages a minute a batch takes about 30 s,
+# well inside the claim lease.
+OUTBOX_BATCH_SIZE = 10
+# A claimed notification is offered to other workers again after this long,
+# in case the worker that claimed it died mid-send.
+OUTBOX_CLAIM_TIMEOUT = timedelta(minutes=5)
+# Held while a relay runs. Telegram's limits are tracked per process, so
+# only one relay may send at a time.
+OUTBOX_RELAY_LOCK_KEY = "outbox:relay:lock"
+OUTBOX_RETRY_BACKOFF = timedelta(seconds=30)
+OUTBOX_MAX_RETRY_DELAY = timedelta(hours=1)
+OUTBOX_MAX_ATTEMPTS = 10
+HOLD_EXPIRY_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def format_overdue_borrowing(book_title, book_author, user_email, expected_return_date):
+    return (
+        f"Book: {book_title}\n"
+        f"Author: {book_author}\n"
+        f"Borrowed by: {user_email}\n"
+        f"Expected return date: {expected_return_date}\n"
+    )
+
 
-load_dotenv()
+def build_overdue_digests(entries, limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Pack overdue entries into as few messages as possible,
+    each one below Telegram's message size limit.
+    """
+    header = "Overdue borrowing alert! 📚\n"
+    digest = header
+    for entry in entries:
+        if len(digest) + len(entry) + 1 > limit and digest != header:
+            yield digest
+            digest = header
+        digest += f"\n{entry}"
 
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{os.getenv('BOT_TOKEN')}/sendMessage"
-TELEGRAM_CHAT_ID = os.getenv("CHAT_ID")
+    if digest != header:
+        yield digest
 
 
 @shared_task
 def notify_overdue_borrowings():
+    started = time.monotonic()
     today = timezone.now().date()
-    overdue_borrowings = Borrowing.objects.filter(
-        expected_return_date__lte=today, actual_return_date__isnull=True
+    overdue_rows = (
+        Borrowing.objects.filter(
+            expected_return_date__lte=today, actual_return_date__isnull=True
+        )
+        .order_by("id")
+        .values_list(
+            "book__title", "book__author", "user__email", "expected_return_date"
+        )
+        .iterator(chunk_size=OVERDUE_CHUNK_SIZE)
     )
 
-    if overdue_borrowings.exists():
-        for borrowing in overdue_borrowings:
-            message = (
-                f"Overdue borrowing alert! 📚\n"
-                f"Book: {borrowing.book.title}\n"
-                f"Author: {borrowing.book.author}\n"
-                f"Borrowed by: {borrowing.user.email}\n"
-                f"Expected return date: {borrowing.expected_return_date}\n"
-            )
-            send_telegram_message(message)
-    else:
+    rows_processed = 0
+    messages_sent = 0
+    batch = []
+
+    def entries():
+        nonlocal rows_processed
+        for row in overdue_rows:
+            rows_processed += 1
+            yield format_overdue_borrowing(*row)
+
+    for digest in build_overdue_digests(entries()):
+        batch.append(send_telegram_message.s(digest))
+        if len(batch) == OVERDUE_SEND_GROUP_SIZE:
+            group(batch).apply_async()
+            messages_sent += len(batch)
+            batch = []
+
+    if batch:
+        group(batch).apply_async()
+        messages_sent += len(batch)
+
+    if not rows_processed:
         send_telegram_message.delay("No borrowings overdue today!")
 
+    duration = time.monotonic() - started
+    logger.info(
+        "Overdue notification run: %s rows, %s messages in %.2fs",
+        rows_processed,
+        messages_sent,
+        duration,
+    )
+
+    return {
+        "rows_processed": rows_processed,
+        "messages_sent": messages_sent,
+        "duration": duration,
+    }
+
 
 @shared_task
 def send_telegram_message(text):
-    requests.post(TELEGRAM_API_URL, data={"chat_id": TELEGRAM_CHAT_ID, "text": text})
+    get_telegram_client().send_message(text)
+
+
+def claim_outbox_batch(batch_size):
+    """
+    Lease a batch of due notifications to this worker and count the
+    attempt. The transaction only covers the claim, so no row lock is
+    held while Telegram is being called.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            NotificationOutbox.objects.filter(
+                sent_at__isnull=True, next_attempt_at__lte=now
+            )
+            .order_by("next_attempt_at", "id")
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        NotificationOutbox.objects.filter(
+            id__in=[notification.id for notification in batch]
+        ).update(attempts=F("attempts") + 1, next_attempt_at=now + OUTBOX_CLAIM_TIMEOUT)
+
+    for notification in batch:
+        notification.attempts += 1
+    return batch
+
+
+def retry_delay(attempts):
+    return min(OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1), OUTBOX_MAX_RETRY_DELAY)
+
+
+@shared_task
+def relay_notification_outbox(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Drain due outbox notifications to Telegram in batches. Rows are
+    marked sent only after delivery, so a crash leads to a resend rather
+    than a lost message. Failed rows back off exponentially and are
+    parked with ``next_attempt_at`` cleared after ``OUTBOX_MAX_ATTEMPTS``;
+    setting it again requeues them. Returns 0 straight away while another
+    relay is running.
+    """
+    lock_timeout = OUTBOX_CLAIM_TIMEOUT.total_seconds()
+    if not cache.add(OUTBOX_RELAY_LOCK_KEY, True, lock_timeout):
+        return 0
+
+    try:
+        return _relay_outbox_batches(batch_size, lock_timeout)
+    finally:
+        cache.delete(OUTBOX_RELAY_LOCK_KEY)
+
+
+def _relay_outbox_batches(batch_size, lock_timeout):
+    client = get_telegram_client()
+    delivered = 0
+
+    while batch := claim_outbox_batch(batch_size):
+        cache.touch(OUTBOX_RELAY_LOCK_KEY, lock_timeout)
+        sent_ids = []
+        failed_ids = defaultdict(list)
+        for notification in batch:
+            try:
+                client.send_message(notification.message)
+            except TelegramDeliveryError as e:
+                logger.error(f"Failed to send notification {notification.id}: {e}")
+                failed_ids[notification.attempts].append(notification.id)
+            else:
+                sent_ids.append(notification.id)
+
+        now = timezone.now()
+        with transaction.atomic():
+            NotificationOutbox.objects.filter(id__in=sent_ids).update(sent_at=now)
+            for attempts, ids in failed_ids.items():
+                if attempts >= OUTBOX_MAX_ATTEMPTS:
+                    logger.error(
+                        f"Giving up on notifications {ids} after {attempts} attempts"
+                    )
+                    next_attempt_at = None
+                else:
+                    next_attempt_at = now + retry_delay(attempts)
+                NotificationOutbox.objects.filter(id__in=ids).update(
+                    next_attempt_at=next_attempt_at
+                )
+        delivered += len(sent_ids)
+
+    return delivered
+
+
+@shared_task
+def expire_holds(batch_size=HOLD_EXPIRY_BATCH_SIZE):
+    """
+    Expire ready holds whose pickup window has passed, in batches, and
+    hand their copies to the next holds in line. Returns the number of
+    holds expired.
+    """
+    expired = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Hold.objects.filter(status="READY", expires_at__lte=timezone.now())
+                .order_by("expires_at")
+                .select_for_update(skip_locked=True)
+                .values_list("id", "book_id")[:batch_size]
+            )
+            if not batch:
+                break
+
+            Hold.objects.filter(id__in=[hold_id for hold_id, _ in batch]).update(
+                status="EXPIRED"
+            )
+            Hold.pass_on(Counter(book_id for _, book_id in batch))
+            expired += len(batch)
+
+    return expired
@@ -1,16 +1,41 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
 from book.models import Book
-from borrowing.models import Borrowing
-from payment.models import Payment
+from borrowing.fines import FINE_MULTIPLIER, annotate_accrued_fines, calculate_fine
+from borrowing.models import Borrowing, Hold, NotificationOutbox
+from borrowing.serializers import (
+    BorrowingDetailSerializer,
+    BorrowingDetailValuesSerializer,
+    BorrowingListSerializer,
+    BorrowingListValuesSerializer,
+)
+from borrowing.views import BORROWING_EXPORT_FIELDS
+from borrowing.tasks import (
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RELAY_LOCK_KEY,
+    build_overdue_digests,
+    expire_holds,
+    notify_overdue_borrowings,
+    relay_notification_outbox,
+)
+from payment.models import Payment, PendingPaymentCounter
+from telegram_client import TelegramDeliveryError
 
 
 class TestBorrowingModel(TestCase):
@@ -49,6 +74,40 @@ class TestBorrowingModel(TestCase):
                 expected_return_date=date.today() + timedelta(days=7),
             )
 
+    def test_update_validates_only_dirty_fields(self):
+        Borrowing.objects.create(
+            book=self.book,
+            user=self.user,
+            expected_return_date=date.today() + timedelta(days=7),
+        )
+        borrowing = Borrowing.objects.get()
+        borrowing.expected_return_date += timedelta(days=1)
+
+        self.assertEqual(borrowing.get_dirty_fields(), {"expected_return_date"})
+        with self.assertNumQueries(1):
+            borrowing.save()
+
+    def test_changed_book_is_checked_for_inventory(self):
+        borrowing = Borrowing.objects.create(
+            book=self.book,
+            user=self.user,
+            expected_return_date=date.today() + timedelta(days=7),
+        )
+        empty_book = Book.objects.create(
+            title="Empty Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=0,
+            daily_fee=5.00,
+        )
+        borrowing.book = empty_book
+
+        with self.assertRaises(ValidationError):
+            borrowing.save()
+
+        borrowing.save(validate=False)
+        self.assertEqual(Borrowing.objects.get().book, empty_book)
+
 
 class TestBorrowingUnauthenticatedUser(TestCase):
     def setUp(self):
@@ -102,7 +161,7 @@ class TestBorrowingAuthenticatedUser(TestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_filter_by_user_if_staff(self):
         user_staff = get_user_model().objects.create_superuser(
@@ -113,29 +172,123 @@ class TestBorrowingAuthenticatedUser(TestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_filter_by_user_if_not_staff(self):
         url = reverse("borrowing:borrowing-list") + "?user_id={}".format(self.user_2.id)
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
-        for borrowing in response.data:
+        for borrowing in response.data["results"]:
             self.assertEqual(borrowing["user"], self.user.email)
 
+    def test_list_borrowings_by_cursor(self):
+        url = reverse("borrowing:borrowing-list") + "?page_size=1"
+        first_page = self.client.get(url)
+        second_page = self.client.get(first_page.data["next"])
+
+        self.assertEqual(len(first_page.data["results"]), 1)
+        self.assertEqual(len(second_page.data["results"]), 1)
+        self.assertIsNone(second_page.data["next"])
+        self.assertLess(
+            first_page.data["results"][0]["id"], second_page.data["results"][0]["id"]
+        )
+
+    def test_invalid_cursor(self):
+        url = reverse("borrowing:borrowing-list") + "?cursor=invalid"
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_sampled_request_reports_timings(self):
+        response = self.client.get(reverse("borrowing:borrowing-list"))
+
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn("serializer;dur=", response["Server-Timing"])
+
+        metrics = self.client.get(reverse("metrics"))
+        self.assertIn(
+            'http_request_sql_queries_count{view="borrowing:borrowing-list"}',
+            metrics.content.decode(),
+        )
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0.0)
+    def test_unsampled_request_has_no_timings(self):
+        response = self.client.get(reverse("borrowing:borrowing-list"))
+
+        self.assertNotIn("Server-Timing", response)
+
+    def test_values_serializers_render_identical_json(self):
+        renderer = JSONRenderer()
+        queryset = Borrowing.objects.select_related("book", "user").order_by("id")
+
+        for serializer_class, values_serializer_class in (
+            (BorrowingListSerializer, BorrowingListValuesSerializer),
+            (BorrowingDetailSerializer, BorrowingDetailValuesSerializer),
+        ):
+            rows = values_serializer_class.prepare_queryset(queryset)
+            self.assertEqual(
+                renderer.render(values_serializer_class(rows, many=True).data),
+                renderer.render(serializer_class(queryset, many=True).data),
+            )
+            self.assertEqual(
+                renderer.render(values_serializer_class(rows.first()).data),
+                renderer.render(serializer_class(queryset.first()).data),
+            )
+
+    def test_retrieve_borrowing(self):
+        own = Borrowing.objects.filter(user=self.user).first()
+        other = Borrowing.objects.filter(user=self.user_2).first()
+
+        response = self.client.get(
+            reverse("borrowing:borrowing-detail", kwargs={"pk": own.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["book"], self.book.title)
+        self.assertEqual(response.data["daily_fee"], 5)
+
+        response = self.client.get(
+            reverse("borrowing:borrowing-detail", kwargs={"pk": other.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_csv(self):
+        url = reverse("borrowing:borrowing-export", kwargs={"file_format": "csv"})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(BORROWING_EXPORT_FIELDS))
+        self.assertEqual(len(lines), 3)
+
+    def test_export_ndjson_matches_list(self):
+        url = reverse("borrowing:borrowing-export", kwargs={"file_format": "ndjson"})
+        response = self.client.get(url, {"is_active": "true"})
+
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        listed = self.client.get(
+            reverse("borrowing:borrowing-list"), {"is_active": "true"}
+        ).data["results"]
+        self.assertEqual(rows, json.loads(json.dumps(listed)))
+
     def test_filter_by_is_active_true(self):
         url = reverse("borrowing:borrowing-list") + "?is_active=true"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_filter_by_is_active_false(self):
         url = reverse("borrowing:borrowing-list") + "?is_active=false"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
 
 class TestReturnBorrowing(TestCase):
@@ -175,3 +328,645 @@ class TestReturnBorrowing(TestCase):
         self.assertFalse(
             Payment.objects.filter(borrowing_id=self.borrowing_on_time.id).exists()
         )
+
+    def test_return_overdue_borrowing_creates_single_fine(self):
+        Borrowing.objects.filter(pk=self.borrowing_overdue.id).update(
+            expected_return_date=timezone.now().date() - timezone.timedelta(days=3)
+        )
+        url = reverse(
+            "borrowing:borrowing-return-book", kwargs={"pk": self.borrowing_overdue.id}
+        )
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fines = Payment.objects.filter(
+            borrowing_id=self.borrowing_overdue.id, type="FINE"
+        )
+        self.assertEqual(fines.count(), 1)
+        self.assertEqual(fines.get().money_to_pay, 3 * 5 * 2)
+
+    def test_return_restores_inventory_once(self):
+        inventory = Book.objects.get(pk=self.book.pk).inventory
+        url = reverse(
+            "borrowing:borrowing-return-book", kwargs={"pk": self.borrowing_on_time.id}
+        )
+        self.client.post(url)
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, inventory + 1)
+
+    def test_return_query_count(self):
+        url = reverse(
+            "borrowing:borrowing-return-book", kwargs={"pk": self.borrowing_on_time.id}
+        )
+        # select borrowing + book, savepoint, update borrowing, update book,
+        # allocate to waiting holds, release
+        with self.assertNumQueries(6):
+            self.client.post(url)
+
+    def test_return_overdue_query_count(self):
+        Borrowing.objects.filter(pk=self.borrowing_overdue.id).update(
+            expected_return_date=timezone.now().date() - timezone.timedelta(days=1)
+        )
+        url = reverse(
+            "borrowing:borrowing-return-book", kwargs={"pk": self.borrowing_overdue.id}
+        )
+        # the on-time queries plus the fine insert and pending counter upsert
+        with self.assertNumQueries(8):
+            self.client.post(url)
+
+
+class TestHolds(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="testuser@example.com", password="password123"
+        )
+        self.other_user = get_user_model().objects.create_user(
+            email="other@example.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=1,
+            daily_fee=5.00,
+        )
+        self.borrowing = Borrowing.objects.create(
+            book=self.book,
+            user=self.other_user,
+            expected_return_date=date.today() + timedelta(days=5),
+        )
+        Book.objects.filter(pk=self.book.pk).update(inventory=0)
+        self.client.force_authenticate(user=self.user)
+
+    def place_hold(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.post(
+            reverse("borrowing:borrowing-holds"), {"book": self.book.id}
+        )
+
+    def test_holds_queue_in_order(self):
+        first = self.place_hold(self.user)
+        second = self.place_hold(self.other_user)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data["status"], "WAITING")
+        self.assertEqual(first.data["position"], 1)
+        self.assertEqual(second.data["position"], 2)
+
+        # listed for the user who placed the second hold
+        response = self.client.get(reverse("borrowing:borrowing-holds"))
+        self.assertEqual([hold["position"] for hold in response.data], [2])
+
+    def test_hold_rejected_when_book_is_available(self):
+        Book.objects.filter(pk=self.book.pk).update(inventory=1)
+
+        response = self.place_hold(self.user)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_one_active_hold_per_book(self):
+        self.place_hold(self.user)
+
+        response = self.place_hold(self.user)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Hold.objects.count(), 1)
+
+    def test_return_allocates_copy_to_oldest_hold(self):
+        first = self.place_hold(self.user)
+        self.place_hold(self.other_user)
+        notifications = NotificationOutbox.objects.count()
+
+        self.borrowing.return_borrowing()
+
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 0)
+        hold = Hold.objects.get(pk=first.data["id"])
+        self.assertEqual(hold.status, "READY")
+        self.assertGreater(hold.expires_at, timezone.now())
+        self.assertEqual(
+            Hold.objects.filter(user=self.other_user).get().status, "WAITING"
+        )
+        self.assertEqual(NotificationOutbox.objects.count(), notifications + 1)
+
+    def test_bulk_return_allocates_copies(self):
+        self.place_hold(self.user)
+
+        Borrowing.return_many([self.borrowing])
+
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 0)
+        self.assertEqual(Hold.objects.get().status, "READY")
+
+    def test_ready_hold_is_picked_up_by_borrowing(self):
+        self.place_hold(self.user)
+        self.borrowing.return_borrowing()
+
+        # the held copy is not on the shelf for anyone else
+        self.client.force_authenticate(user=self.other_user)
+        payload = {
+            "book": self.book.id,
+            "expected_return_date": date.today() + timedelta(days=7),
+        }
+        response = self.client.post(reverse("borrowing:borrowing-list"), payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse("borrowing:borrowing-list"), payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Hold.objects.get().status, "FULFILLED")
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 0)
+
+    def test_ready_hold_is_used_before_shelf_copies(self):
+        self.place_hold(self.user)
+        self.borrowing.return_borrowing()
+        Book.objects.filter(pk=self.book.pk).update(inventory=3)
+
+        response = self.client.post(
+            reverse("borrowing:borrowing-list"),
+            {
+                "book": self.book.id,
+                "expected_return_date": date.today() + timedelta(days=7),
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Hold.objects.get().status, "FULFILLED")
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 3)
+
+    def test_bulk_borrowing_picks_up_ready_hold(self):
+        self.place_hold(self.user)
+        self.borrowing.return_borrowing()
+
+        response = self.client.post(
+            reverse("borrowing:borrowing-bulk"),
+            {
+                "borrowings": [
+                    {
+                        "book": self.book.id,
+                        "expected_return_date": date.today() + timedelta(days=7),
+                    }
+                ]
+                * 2
+            },
+            format="json",
+        )
+
+        results = response.data["results"]
+        self.assertIn("id", results[0])
+        self.assertIn("not available", results[1]["error"])
+        self.assertEqual(Hold.objects.get().status, "FULFILLED")
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 0)
+
+    def test_expired_hold_passes_copy_on(self):
+        first = self.place_hold(self.user)
+        second = self.place_hold(self.other_user)
+        self.borrowing.return_borrowing()
+        Hold.objects.filter(pk=first.data["id"]).update(expires_at=timezone.now())
+
+        self.assertEqual(expire_holds(), 1)
+
+        self.assertEqual(Hold.objects.get(pk=first.data["id"]).status, "EXPIRED")
+        self.assertEqual(Hold.objects.get(pk=second.data["id"]).status, "READY")
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 0)
+
+        Hold.objects.filter(pk=second.data["id"]).update(expires_at=timezone.now())
+        expire_holds()
+
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 1)
+
+    def test_cancel_ready_hold_returns_copy_to_shelf(self):
+        hold_id = self.place_hold(self.user).data["id"]
+        self.borrowing.return_borrowing()
+
+        response = self.client.post(
+            reverse("borrowing:borrowing-cancel-hold", kwargs={"hold_id": hold_id})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "CANCELLED")
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 1)
+
+    def test_cannot_cancel_another_users_hold(self):
+        hold_id = self.place_hold(self.other_user).data["id"]
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse("borrowing:borrowing-cancel-hold", kwargs={"hold_id": hold_id})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestBulkBorrowing(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="testuser@example.com", password="password123"
+        )
+        self.books = [
+            Book.objects.create(
+                title=f"Test Book {i}",
+                author="Test Author",
+                cover="HARD",
+                inventory=2,
+                daily_fee=5.00,
+            )
+            for i in range(3)
+        ]
+        self.expected_return_date = date.today() + timedelta(days=7)
+        self.client.force_authenticate(user=self.user)
+
+    def bulk_borrow(self, book_ids):
+        return self.client.post(
+            reverse("borrowing:borrowing-bulk"),
+            {
+                "borrowings": [
+                    {"book": book_id, "expected_return_date": self.expected_return_date}
+                    for book_id in book_ids
+                ]
+            },
+            format="json",
+        )
+
+    def test_bulk_borrow_reports_per_item_results(self):
+        book = self.books[0]
+        response = self.bulk_borrow([book.id, book.id, book.id, 999999])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.data["results"]
+        self.assertIn("id", results[0])
+        self.assertIn("id", results[1])
+        self.assertIn("not available", results[2]["error"])
+        self.assertEqual(results[3]["error"], "Book not found.")
+        self.assertEqual(Book.objects.get(pk=book.pk).inventory, 0)
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+
+    def test_bulk_borrow_query_count_does_not_grow(self):
+        # pending check, savepoint, lock ready holds, lock books,
+        # update books, insert borrowings, insert notifications, release
+        with self.assertNumQueries(8):
+            self.bulk_borrow([self.books[0].id])
+        with self.assertNumQueries(8):
+            self.bulk_borrow([book.id for book in self.books] * 2)
+
+    def test_bulk_return_charges_fines(self):
+        self.bulk_borrow([book.id for book in self.books])
+        borrowings = list(Borrowing.objects.order_by("id"))
+        Borrowing.objects.filter(pk=borrowings[0].pk).update(
+            expected_return_date=date.today() - timedelta(days=2)
+        )
+
+        response = self.client.post(
+            reverse("borrowing:borrowing-bulk-return"),
+            {"borrowings": [borrowing.id for borrowing in borrowings] + [999999]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(results[0]["fine"], 2 * 5 * 2)
+        self.assertIsNone(results[1]["fine"])
+        self.assertEqual(results[3]["error"], "Borrowing not found.")
+        self.assertFalse(
+            Borrowing.objects.filter(actual_return_date__isnull=True).exists()
+        )
+        self.assertEqual(set(Book.objects.values_list("inventory", flat=True)), {2})
+        self.assertEqual(Payment.objects.filter(type="FINE").count(), 1)
+        self.assertTrue(PendingPaymentCounter.has_pending(self.user.id))
+
+    def test_bulk_return_skips_returned_borrowings(self):
+        self.bulk_borrow([self.books[0].id])
+        borrowing = Borrowing.objects.get()
+        url = reverse("borrowing:borrowing-bulk-return")
+
+        self.client.post(url, {"borrowings": [borrowing.id]}, format="json")
+        response = self.client.post(url, {"borrowings": [borrowing.id]}, format="json")
+
+        self.assertEqual(
+            response.data["results"][0]["error"], "The book is already returned."
+        )
+        self.assertEqual(Book.objects.get(pk=self.books[0].pk).inventory, 2)
+
+
+class TestAccruedFines(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="testuser@example.com", password="password123"
+        )
+        self.staff = get_user_model().objects.create_user(
+            email="staff@example.com", password="password123", is_staff=True
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=10,
+            daily_fee=5.00,
+        )
+        self.today = date.today()
+        for days_overdue in (3, 1, -2):
+            borrowing = Borrowing.objects.create(
+                book=self.book,
+                user=self.user,
+                expected_return_date=self.today + timedelta(days=7),
+            )
+            Borrowing.objects.filter(pk=borrowing.pk).update(
+                expected_return_date=self.today - timedelta(days=days_overdue)
+            )
+        self.client.force_authenticate(user=self.staff)
+
+    def test_annotation_matches_scalar_fine(self):
+        borrowings = annotate_accrued_fines(
+            Borrowing.objects.select_related("book"), self.today
+        )
+
+        self.assertEqual(borrowings.count(), 2)
+        for borrowing in borrowings:
+            self.assertEqual(
+                borrowing.accrued_fine,
+                calculate_fine(
+                    borrowing.expected_return_date,
+                    self.today,
+                    borrowing.book.daily_fee,
+                ),
+            )
+
+    def test_accrued_fines_summary(self):
+        response = self.client.get(reverse("borrowing:borrowing-accrued-fines"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["borrowings"], 2)
+        self.assertEqual(response.data["total"], (3 + 1) * 5 * FINE_MULTIPLIER)
+
+    def test_accrued_fines_export(self):
+        response = self.client.get(
+            reverse("borrowing:borrowing-accrued-fines-export"),
+            {"as_of": (self.today + timedelta(days=1)).isoformat()},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[0], "borrowing_id")
+        self.assertEqual(len(lines), 3)
+        *_, overdue_days, accrued_fine = lines[1].split(",")
+        self.assertEqual(int(overdue_days), 4)
+        self.assertEqual(Decimal(accrued_fine), 4 * 5 * FINE_MULTIPLIER)
+
+    def test_accrued_fines_require_staff(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(reverse("borrowing:borrowing-accrued-fines"))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_as_of(self):
+        response = self.client.get(
+            reverse("borrowing:borrowing-accrued-fines"), {"as_of": "yesterday"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestConcurrentBorrowing(TransactionTestCase):
+    requests_count = 200
+    inventory = 50
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f"reader{i}@example.com", password="password123"
+            )
+            for i in range(20)
+        ]
+        self.book = Book.objects.create(
+            title="Popular Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=self.inventory,
+            daily_fee=5.00,
+        )
+
+    def _borrow(self, index):
+        client = APIClient()
+        client.force_authenticate(user=self.users[index % len(self.users)])
+        try:
+            response = client.post(
+                reverse("borrowing:borrowing-list"),
+                {
+                    "book": self.book.id,
+                    "expected_return_date": date.today() + timedelta(days=7),
+                },
+            )
+            return response.status_code
+        finally:
+            connection.close()
+
+    def test_parallel_checkouts_never_oversell(self):
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            codes = list(executor.map(self._borrow, range(self.requests_count)))
+
+        self.book.refresh_from_db()
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), self.inventory)
+        self.assertEqual(
+            codes.count(status.HTTP_400_BAD_REQUEST),
+            self.requests_count - self.inventory,
+        )
+        self.assertEqual(self.book.inventory, 0)
+        self.assertEqual(
+            Borrowing.objects.filter(book=self.book).count(), self.inventory
+        )
+        self.assertEqual(NotificationOutbox.objects.count(), self.inventory)
+
+
+class TestOverdueNotifications(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="testuser@example.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=100,
+            daily_fee=5.00,
+        )
+
+    def test_digests_stay_under_limit(self):
+        entries = [f"entry {i}\n" * 10 for i in range(500)]
+        digests = list(build_overdue_digests(entries, limit=1000))
+
+        self.assertGreater(len(digests), 1)
+        for digest in digests:
+            self.assertLessEqual(len(digest), 1000)
+        self.assertEqual(sum(digest.count("entry") for digest in digests), 5000)
+
+    @patch("borrowing.tasks.group")
+    def test_overdue_rows_are_streamed_in_few_queries(self, mock_group):
+        for _ in range(30):
+            Borrowing.objects.create(
+                book=self.book,
+                user=self.user,
+                expected_return_date=date.today() + timedelta(days=1),
+            )
+        Borrowing.objects.update(expected_return_date=date.today())
+
+        with self.assertNumQueries(1):
+            result = notify_overdue_borrowings()
+
+        self.assertEqual(result["rows_processed"], 30)
+        self.assertEqual(result["messages_sent"], 1)
+        mock_group.return_value.apply_async.assert_called_once()
+
+    @patch("borrowing.tasks.send_telegram_message.delay")
+    def test_no_overdue_borrowings(self, mock_delay):
+        result = notify_overdue_borrowings()
+
+        self.assertEqual(result["rows_processed"], 0)
+        mock_delay.assert_called_once_with("No borrowings overdue today!")
+
+
+class TestNotificationOutbox(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="testuser@example.com", password="password123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=10,
+            daily_fee=5.00,
+        )
+
+    @patch("telegram_client.MockTelegramClient.send_message")
+    def test_create_borrowing_queues_notification(self, mock_send):
+        response = self.client.post(
+            reverse("borrowing:borrowing-list"),
+            {
+                "book": self.book.id,
+                "expected_return_date": date.today() + timedelta(days=7),
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_send.assert_not_called()
+        notification = NotificationOutbox.objects.get()
+        self.assertIn(f"*ID: {response.data['id']}", notification.message)
+        self.assertIsNone(notification.sent_at)
+
+    @patch("telegram_client.MockTelegramClient.send_message")
+    def test_relay_marks_delivered_notifications(self, mock_send):
+        mock_send.side_effect = [{"ok": True}, TelegramDeliveryError("down")]
+        delivered = NotificationOutbox.enqueue("first")
+        failed = NotificationOutbox.enqueue("second")
+
+        self.assertEqual(relay_notification_outbox(), 1)
+
+        delivered.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertIsNotNone(delivered.sent_at)
+        self.assertIsNone(failed.sent_at)
+        self.assertEqual(failed.attempts, 1)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+
+    @patch("telegram_client.MockTelegramClient.send_message")
+    def test_relay_continues_past_failed_batch(self, mock_send):
+        mock_send.side_effect = [TelegramDeliveryError("down"), {"ok": True}]
+        NotificationOutbox.enqueue("first")
+        NotificationOutbox.enqueue("second")
+
+        self.assertEqual(relay_notification_outbox(batch_size=1), 1)
+        self.assertEqual(mock_send.call_count, 2)
+
+    @patch("telegram_client.MockTelegramClient.send_message")
+    def test_relay_skips_while_another_relay_runs(self, mock_send):
+        NotificationOutbox.enqueue("first")
+        cache.add(OUTBOX_RELAY_LOCK_KEY, True)
+
+        try:
+            self.assertEqual(relay_notification_outbox(), 0)
+        finally:
+            cache.delete(OUTBOX_RELAY_LOCK_KEY)
+
+        mock_send.assert_not_called()
+        self.assertEqual(relay_notification_outbox(), 1)
+
+    @patch("telegram_client.MockTelegramClient.send_message")
+    def test_relay_gives_up_after_max_attempts(self, mock_send):
+        mock_send.side_effect = TelegramDeliveryError("down")
+        notification = NotificationOutbox.enqueue("doomed")
+        NotificationOutbox.objects.filter(pk=notification.pk).update(
+            attempts=OUTBOX_MAX_ATTEMPTS - 1
+        )
+
+        relay_notification_outbox()
+        relay_notification_outbox()
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.attempts, OUTBOX_MAX_ATTEMPTS)
+        self.assertIsNone(notification.next_attempt_at)
+        self.assertEqual(mock_send.call_count, 1)
+
+
+class TestAsyncBorrowingEndpoints(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="testuser@example.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=10,
+            daily_fee=5.00,
+        )
+        self.headers = {"HTTP_AUTHORIZE": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def test_auth_required(self):
+        response = self.client.post(
+            reverse("async-borrowing-create"), {}, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+    async def test_sampled_async_request_counts_queries(self):
+        response = await self.async_client.post(
+            reverse("async-borrowing-create"),
+            {
+                "book": self.book.id,
+                "expected_return_date": str(date.today() + timedelta(days=7)),
+            },
+            content_type="application/json",
+            headers={"Authorize": self.headers["HTTP_AUTHORIZE"]},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('desc="0 queries"', response["Server-Timing"])
+
+    def test_create_and_return_borrowing(self):
+        response = self.client.post(
+            reverse("async-borrowing-create"),
+            {
+                "book": self.book.id,
+                "expected_return_date": str(date.today() + timedelta(days=7)),
+            },
+            content_type="application/json",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 9)
+
+        response = self.client.post(
+            reverse("async-borrowing-return", kwargs={"pk": response.json()["id"]}),
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["message"], "Book was successfully returned.")
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 10)
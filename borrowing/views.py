@@ -1,28 +1,68 @@
-from asgiref.sync import async_to_sync
-from django.apps import apps
-from django.db import transaction
+from django.db.models import Count, Sum
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from rest_framework import viewsets, status
+from django.utils.dateparse import parse_date
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
-from borrowing.models import Borrowing
+from borrowing.fines import annotate_accrued_fines
+from borrowing.models import Borrowing, Hold
 from borrowing.serializers import (
     BorrowingListSerializer,
     BorrowingDetailSerializer,
     BorrowingSerializer,
     BorrowingCreateSerializer,
     BorrowingReturnSerializer,
+    BorrowingBulkCreateSerializer,
+    BorrowingBulkReturnSerializer,
+    BorrowingDetailValuesSerializer,
+    BorrowingListValuesSerializer,
+    HoldSerializer,
 )
-from borrowing.schemas.borowings import borrowing_list_schema
-from telegram_bot import send_borrowing_notification
-
+from borrowing.schemas.borowings import (
+    accrued_fines_export_schema,
+    accrued_fines_schema,
+    borrowing_export_schema,
+    borrowing_list_schema,
+)
+from library_service.export import stream_export
+from library_service.instrumentation import InstrumentedViewMixin
+from library_service.pagination import BorrowingPagination
+from library_service.values_serializers import ValuesSerializerMixin
+
+
+ACCRUED_FINES_EXPORT_FIELDS = {
+    "borrowing_id": "id",
+    "user_email": "user__email",
+    "book_title": "book__title",
+    "expected_return_date": "expected_return_date",
+    "overdue_days": "overdue_days",
+    "accrued_fine": "accrued_fine",
+}
+BORROWING_EXPORT_FIELDS = {
+    "id": "id",
+    "book": "book__title",
+    "author": "book__author",
+    "user": "user__email",
+    "borrow_date": "borrow_date",
+    "expected_return_date": "expected_return_date",
+    "actual_return_date": "actual_return_date",
+}
 
 
 @borrowing_list_schema
-class BorrowingViewSet(viewsets.ModelViewSet):
+class BorrowingViewSet(
+    ValuesSerializerMixin, InstrumentedViewMixin, viewsets.ModelViewSet
+):
     permission_classes = (IsAuthenticated,)
+    pagination_class = BorrowingPagination
+    values_serializer_classes = {
+        "list": BorrowingListValuesSerializer,
+        "retrieve": BorrowingDetailValuesSerializer,
+    }
 
     def get_queryset(self):
         queryset = Borrowing.objects.all()
@@ -33,7 +73,7 @@ class BorrowingViewSet(viewsets.ModelViewSet):
             if user_id:
                 queryset = queryset.filter(user_id=user_id)
         else:
-            queryset = queryset.filter(user=self.request.user)
+            queryset = queryset.filter(user_id=self.request.user.id)
 
         if is_active:
             if is_active.lower() == "true":
@@ -43,6 +83,8 @@ class BorrowingViewSet(viewsets.ModelViewSet):
 
         if self.action in ["list", "retrieve"]:
             queryset = queryset.select_related("book", "user")
+        elif self.action == "return_book":
+            queryset = queryset.select_related("book")
 
         return queryset
 
@@ -55,69 +97,153 @@ class BorrowingViewSet(viewsets.ModelViewSet):
             return BorrowingCreateSerializer
         elif self.action == "return_book":
             return BorrowingReturnSerializer
+        elif self.action == "bulk_create":
+            return BorrowingBulkCreateSerializer
+        elif self.action == "bulk_return":
+            return BorrowingBulkReturnSerializer
+        elif self.action in ("holds", "cancel_hold"):
+            return HoldSerializer
 
         return BorrowingSerializer
 
     @action(detail=True, methods=["POST"], url_path="return", url_name="return-book")
     def return_book(self, request, pk=None):
-        borrowing = self.get_queryset().select_related("book", "user").get(pk=pk)
+        borrowing = self.get_object()
 
         serializer = self.get_serializer(borrowing, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
 
-        if serializer.is_valid():
-            with transaction.atomic():
-                try:
-                    serializer.save()
-
-                    borrowing.actual_return_date = timezone.now().date()
-                    borrowing.save()
-
-                    if borrowing.actual_return_date > borrowing.expected_return_date:
-                        overdue_days = (
-                            borrowing.actual_return_date
-                            - borrowing.expected_return_date
-                        ).days
-                        fine_amount = overdue_days * borrowing.book.daily_fee * 2
-                        payment = apps.get_model("payment", "Payment")
-                        payment.objects.create(
-                            borrowing=borrowing,
-                            money_to_pay=fine_amount,
-                            status="PENDING",
-                            type="FINE",
-                        )
-                        message = (
-                            f"You have to pay {fine_amount} for overdue borrowing."
-                        )
-
-                        return Response({"message": message})
-                    else:
-                        return Response({"message": "Book was successfully returned."})
-                except Exception as e:
-                    return Response(
-                        {
-                            "message": "An error occurred while processing the return.",
-                            "error": format(e),
-                        }
-                    )
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-    def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-
-        if response.status_code == status.HTTP_201_CREATED:
-            borrowing = Borrowing.objects.select_related("book", "user").get(
-                id=response.data["id"]
-            )
+        if serializer.fine_payment is not None:
             message = (
-                f"New Borrowing Created:\n"
-                f"*ID: {borrowing.id}\n"
-                f"*Book title: {borrowing.book.title}\n"
-                f"*User email: {borrowing.user.email}\n"
-                f"*Borrow Date: {borrowing.borrow_date}\n"
-                f"*Expected Return Date: {borrowing.expected_return_date}\n"
+                f"You have to pay {serializer.fine_payment.money_to_pay} "
+                f"for overdue borrowing."
             )
-
-            async_to_sync(send_borrowing_notification)(message)
-
-        return response
+            return Response({"message": message})
+
+        return Response({"message": "Book was successfully returned."})
+
+    @action(detail=False, methods=["POST"], url_path="bulk", url_name="bulk")
+    def bulk_create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+
+        status_code = (
+            status.HTTP_201_CREATED
+            if any("id" in result for result in results)
+            else status.HTTP_400_BAD_REQUEST
+        )
+        return Response({"results": results}, status=status_code)
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="bulk-return",
+        url_name="bulk-return",
+    )
+    def bulk_return(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save(queryset=self.get_queryset())
+
+        return Response({"results": results})
+
+    def get_hold_queryset(self):
+        return Hold.annotate_position(
+            Hold.objects.filter(
+                user_id=self.request.user.id, status__in=Hold.ACTIVE_STATUSES
+            )
+        ).order_by("created_at", "id")
+
+    @action(detail=False, methods=["GET", "POST"], url_path="holds", url_name="holds")
+    def holds(self, request):
+        if request.method == "GET":
+            serializer = self.get_serializer(self.get_hold_queryset(), many=True)
+            return Response(serializer.data)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path=r"holds/(?P<hold_id>\d+)/cancel",
+        url_name="cancel-hold",
+    )
+    def cancel_hold(self, request, hold_id=None):
+        hold = get_object_or_404(self.get_hold_queryset(), pk=hold_id)
+        hold.cancel()
+        hold.position = None
+
+        return Response(self.get_serializer(hold).data)
+
+    def _get_as_of(self):
+        as_of = self.request.query_params.get("as_of")
+        if not as_of:
+            return timezone.now().date()
+
+        try:
+            parsed = parse_date(as_of)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({"as_of": "Date has wrong format. Use YYYY-MM-DD."})
+        return parsed
+
+    @accrued_fines_schema
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="accrued-fines",
+        url_name="accrued-fines",
+        permission_classes=(IsAdminUser,),
+    )
+    def accrued_fines(self, request):
+        as_of = self._get_as_of()
+        summary = annotate_accrued_fines(Borrowing.objects.all(), as_of).aggregate(
+            borrowings=Count("id"), total=Sum("accrued_fine")
+        )
+
+        return Response(
+            {
+                "as_of": as_of,
+                "borrowings": summary["borrowings"],
+                "total": summary["total"] or 0,
+            }
+        )
+
+    @accrued_fines_export_schema
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="accrued-fines/export",
+        url_name="accrued-fines-export",
+        permission_classes=(IsAdminUser,),
+    )
+    def accrued_fines_export(self, request):
+        as_of = self._get_as_of()
+        queryset = annotate_accrued_fines(Borrowing.objects.all(), as_of).order_by(
+            "expected_return_date"
+        )
+
+        return stream_export(
+            queryset, ACCRUED_FINES_EXPORT_FIELDS, "csv", f"accrued-fines-{as_of}"
+        )
+
+    @borrowing_export_schema
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path=r"export/(?P<file_format>csv|ndjson)",
+        url_name="export",
+    )
+    def export(self, request, file_format=None):
+        return stream_export(
+            self.get_queryset().order_by("id"),
+            BORROWING_EXPORT_FIELDS,
+            file_format,
+            "borrowings",
+        )
@@ -0,0 +1,67 @@
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.utils.encoders import JSONEncoder
+
+from user.authentication import ClaimsJWTAuthentication
+
+_authentication = ClaimsJWTAuthentication()
+
+
+def api_response(data, status=200) -> JsonResponse:
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+async def authenticate(request):
+    """
+    Resolve the JWT user of a plain Django request, or return None.
+    """
+    result = await sync_to_async(_authentication.authenticate)(request)
+    return result[0] if result else None
+
+
+def async_api_view(methods, authentication_required=True):
+    """
+    Turn an ``async def view(request, user, data, **kwargs)`` into a JSON API
+    endpoint with JWT authentication, method checks and DRF-style errors.
+    """
+
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return api_response(
+                    {"detail": f'Method "{request.method}" not allowed.'}, status=405
+                )
+
+            try:
+                user = await authenticate(request)
+            except exceptions.AuthenticationFailed as e:
+                return api_response({"detail": e.detail}, status=401)
+            if user is None and authentication_required:
+                return api_response(
+                    {"detail": "Authentication credentials were not provided."},
+                    status=401,
+                )
+
+            try:
+                data = json.loads(request.body or b"{}")
+            except ValueError:
+                return api_response({"detail": "JSON parse error."}, status=400)
+
+            try:
+                return await view(request, user, data, *args, **kwargs)
+            except exceptions.ValidationError as e:
+                return api_response(e.detail, status=400)
+            except ObjectDoesNotExist:
+                return api_response({"detail": "Not found."}, status=404)
+
+        return wrapper
+
+    return decorator
@@ -7,7 +7,7 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_service.settings")
 app = Celery("library_service")
 
 app.config_from_object("django.conf:settings", namespace="CELERY")
-app.autodiscover_tasks(["borrowing"])
+app.autodiscover_tasks(["borrowing", "payment"])
 
 
 @app.task(bind=True)
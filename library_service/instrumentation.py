@@ -0,0 +1,313 @@
+import random
+import threading
+import time
+from asyncio import iscoroutinefunction
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current_metrics = ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    """
+    Minimal thread-safe Prometheus histogram with labels.
+    """
+
+    def __init__(self, name: str, documentation: str, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts, +Inf count, sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series_items = [(key, list(series)) for key, series in self._series.items()]
+
+        for key, series in series_items:
+            labels = ",".join(f'{name}="{value}"' for name, value in key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                bucket_labels = f'{labels},le="{bound}"' if labels else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Counter:
+    """
+    Minimal thread-safe Prometheus counter with labels.
+    """
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1, **labels) -> None:
+        if not amount:
+            return
+
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> int:
+        with self._lock:
+            return self._series.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            series_items = list(self._series.items())
+
+        for key, count in series_items:
+            labels = ",".join(f'{name}="{value}"' for name, value in key)
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}{suffix} {count}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Total request handling time."
+)
+SQL_QUERIES = Histogram(
+    "http_request_sql_queries", "SQL queries per request.", QUERY_COUNT_BUCKETS
+)
+SQL_DURATION = Histogram("http_request_sql_duration_seconds", "SQL time per request.")
+SERIALIZER_DURATION = Histogram(
+    "http_request_serializer_duration_seconds", "Serializer time per request."
+)
+EXTERNAL_DURATION = Histogram(
+    "http_request_external_duration_seconds",
+    "Time spent calling external services per request.",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit or miss)."
+)
+METRICS = [
+    REQUEST_DURATION,
+    SQL_QUERIES,
+    SQL_DURATION,
+    SERIALIZER_DURATION,
+    EXTERNAL_DURATION,
+    CACHE_REQUESTS,
+]
+
+
+class RequestMetrics:
+    def __init__(self) -> None:
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.external = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper feeding the metrics of the request in the current
+    context. It stays installed on each connection instead of being
+    wrapped around a request, so the queries async views run through
+    ``sync_to_async``, on another thread's connection, are counted too.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_recorder(db_connection=connection) -> None:
+    if record_query not in db_connection.execute_wrappers:
+        db_connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_query_recorder_on_connect(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+@contextmanager
+def record_external(service: str):
+    """
+    Time a call to an external service (Stripe, Telegram) for the
+    current sampled request. A no-op outside of sampled requests.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.external[service] = (
+            metrics.external.get(service, 0.0) + time.perf_counter() - started
+        )
+
+
+def _finish(request, metrics, total, response):
+    match = request.resolver_match
+    view = match.view_name if match else "unresolved"
+    REQUEST_DURATION.observe(total, view=view)
+    SQL_QUERIES.observe(metrics.queries, view=view)
+    SQL_DURATION.observe(metrics.sql_time, view=view)
+    SERIALIZER_DURATION.observe(metrics.serializer_time, view=view)
+    for service, duration in metrics.external.items():
+        EXTERNAL_DURATION.observe(duration, view=view, service=service)
+
+    timings = [
+        f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.queries} queries"',
+        f"serializer;dur={metrics.serializer_time * 1000:.2f}",
+        *(
+            f"{service};dur={duration * 1000:.2f}"
+            for service, duration in metrics.external.items()
+        ),
+        f"total;dur={total * 1000:.2f}",
+    ]
+    response["Server-Timing"] = ", ".join(timings)
+    return response
+
+
+@sync_and_async_middleware
+def QueryTimingMiddleware(get_response):
+    """
+    Record query count, SQL, serializer and external-call time for a
+    sample of requests, expose them as a ``Server-Timing`` header and
+    feed the histograms served on ``/metrics``.
+    """
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+                return await get_response(request)
+
+            metrics = RequestMetrics()
+            token = _current_metrics.set(metrics)
+            started = time.perf_counter()
+            # on the thread sync_to_async runs the request's queries on
+            await sync_to_async(install_query_recorder)()
+            try:
+                response = await get_response(request)
+            finally:
+                _current_metrics.reset(token)
+            return _finish(request, metrics, time.perf_counter() - started, response)
+
+    else:
+
+        def middleware(request):
+            if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+                return get_response(request)
+
+            metrics = RequestMetrics()
+            token = _current_metrics.set(metrics)
+            started = time.perf_counter()
+            # the connection may predate this module, e.g. under the test runner
+            install_query_recorder(connection)
+            try:
+                response = get_response(request)
+            finally:
+                _current_metrics.reset(token)
+            return _finish(request, metrics, time.perf_counter() - started, response)
+
+    return middleware
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return super().to_representation(instance)
+
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_depth -= 1
+            if not metrics.serializer_depth:
+                metrics.serializer_time += time.perf_counter() - started
+
+
+_timed_serializer_classes = {}
+
+
+def timed_serializer_class(serializer_class):
+    """
+    Return a subclass of ``serializer_class`` whose output is timed for
+    sampled requests, creating it on first use.
+    """
+    timed_class = _timed_serializer_classes.get(serializer_class)
+    if timed_class is None:
+        timed_class = type(
+            serializer_class.__name__,
+            (TimedSerializerMixin, serializer_class),
+            {"__module__": serializer_class.__module__},
+        )
+        _timed_serializer_classes[serializer_class] = timed_class
+    return timed_class
+
+
+class InstrumentedViewMixin:
+    """
+    DRF view mixin that times serializer output for sampled requests.
+    """
+
+    def get_serializer_class(self):
+        serializer_class = super().get_serializer_class()
+        if getattr(self, "swagger_fake_view", False):
+            return serializer_class
+        return timed_serializer_class(serializer_class)
+
+
+def metrics_view(request):
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return HttpResponse(
+        "\n".join(lines) + "\n", content_type="text/plain; version=0.0.4"
+    )
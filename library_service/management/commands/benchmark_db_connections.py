@@ -0,0 +1,110 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+MODES = ("new_connection", "persistent", "pooled")
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a fixed request rate against the database with a new "
+        "connection per request, persistent connections and the psycopg "
+        "pool, and report latency, connection setup time and connections "
+        "opened as JSON. Point POSTGRES_PORT at PgBouncer and set "
+        "DB_PGBOUNCER=True to measure through it."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rate", type=int, default=400, help="Requests/s.")
+        parser.add_argument("--duration", type=float, default=10)
+        parser.add_argument("--workers", type=int, default=32)
+        parser.add_argument("--pool-size", type=int, default=16)
+
+    def handle(self, *args, **options):
+        report = {"rate": options["rate"], "workers": options["workers"]}
+        for mode in MODES:
+            report[mode] = self._run(mode, options)
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    def _settings(mode, pool_size):
+        settings_dict = deepcopy(connection.settings_dict)
+        settings_dict["OPTIONS"].pop("pool", None)
+        settings_dict["CONN_MAX_AGE"] = 60 if mode == "persistent" else 0
+        if mode == "pooled":
+            settings_dict["OPTIONS"]["pool"] = {
+                "min_size": pool_size,
+                "max_size": pool_size,
+            }
+        return settings_dict
+
+    def _run(self, mode, options):
+        settings_dict = self._settings(mode, options["pool_size"])
+        alias = f"benchmark_{mode}"
+        local = threading.local()
+        lock = threading.Lock()
+        connects = []
+        latencies = []
+        wrappers = []
+
+        def handle_request(scheduled):
+            # DatabaseWrapper is per thread, exactly as in a web worker
+            wrapper = getattr(local, "wrapper", None)
+            if wrapper is None:
+                wrapper = local.wrapper = type(connection)(settings_dict, alias)
+                # closed from the main thread once the run is over
+                wrapper.inc_thread_sharing()
+                with lock:
+                    wrappers.append(wrapper)
+
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            connect_time = 0.0
+            if wrapper.connection is None:
+                started = time.perf_counter()
+                wrapper.ensure_connection()
+                connect_time = time.perf_counter() - started
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            # what request_finished does at the end of every request
+            wrapper.close_if_unusable_or_obsolete()
+
+            with lock:
+                connects.append(connect_time)
+                latencies.append(time.perf_counter() - scheduled)
+
+        count = int(options["rate"] * options["duration"])
+        started = time.perf_counter() + 0.1
+        with ThreadPoolExecutor(options["workers"]) as executor:
+            for i in range(count):
+                executor.submit(handle_request, started + i / options["rate"])
+        elapsed = time.perf_counter() - started
+
+        for wrapper in wrappers:
+            wrapper.close()
+        server_connections = None
+        if mode == "pooled":
+            server_connections = wrappers[0].pool.get_stats()["connections_num"]
+            wrappers[0].close_pool()
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "achieved_rate": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentiles[49] * 1000, 2),
+            "p99_ms": round(percentiles[98] * 1000, 2),
+            "connect_ms_per_request": round(statistics.mean(connects) * 1000, 3),
+            "server_connections_opened": (
+                server_connections
+                if server_connections is not None
+                else sum(1 for connect_time in connects if connect_time)
+            ),
+        }
@@ -0,0 +1,46 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+# orjson writes these two characters raw; DRF escapes them because they
+# are line terminators in JavaScript.
+LINE_SEPARATOR = "\u2028".encode()
+PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+ORJSON_OPTIONS = (
+    # datetime/date/time go through DRF's encoder, which trims
+    # microseconds to milliseconds and writes UTC as "Z"
+    orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_NON_STR_KEYS
+)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer backed by orjson.
+
+    Produces the same bytes as the default compact, non-ASCII-escaped
+    output: Decimal, lazy strings, dates and anything else orjson does
+    not know are handed to DRF's JSONEncoder. Indented output (the
+    browsable API, ``; indent=`` media types) falls back to the stdlib.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if (
+            self.get_indent(accepted_media_type, renderer_context)
+            or self.ensure_ascii
+            or not self.compact
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        rendered = orjson.dumps(data, default=self._default, option=ORJSON_OPTIONS)
+        return rendered.replace(LINE_SEPARATOR, b"\\u2028").replace(
+            PARAGRAPH_SEPARATOR, b"\\u2029"
+        )
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -49,11 +50,13 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # third-party
     "rest_framework",
     "rest_framework_simplejwt",
     "drf_spectacular",
     # custom apps
+    "library_service",
     "borrowing",
     "book",
     "user",
@@ -61,6 +64,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "library_service.instrumentation.QueryTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -102,9 +106,35 @@ DATABASES = {
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        # Ping reused connections before handing them out, pooled or not
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
     }
 }
 
+# Each process keeps a psycopg pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+# connections shared by its threads; size it to the process's threads
+# (1-2 for a prefork Celery child). Without the pool, connections persist
+# for DB_CONN_MAX_AGE seconds instead.
+if (os.getenv("DB_POOL") or "True").lower() == "true":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE") or 2),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE") or 10),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT") or 10),
+        "max_idle": 300,
+        "max_lifetime": 1800,
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE") or 60)
+
+# PgBouncer in transaction mode hands each transaction to any server
+# connection, so nothing may outlive a transaction: no server-side
+# cursors for iterator() and no prepared statements.
+if (os.getenv("DB_PGBOUNCER") or "False").lower() == "true":
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+    DATABASES["default"]["OPTIONS"]["prepare_threshold"] = None
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -153,15 +183,62 @@ AUTH_USER_MODEL = "user.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": (
+        "library_service.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "library_service.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+}
+
+# Read by library_service.pagination; set per view, not globally through
+# REST_FRAMEWORK["PAGE_SIZE"], as not every list endpoint is paginated.
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", 50))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", 500))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL") or "redis://redis:6379/1",
+    }
 }
+# The test database restarts ids from 1, so never share a cache with it
+if (os.getenv("TEST_MODE") or "False").lower() == "true":
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Book metadata is read through the cache; inventory is cached briefly
+# and dropped whenever a copy is borrowed or returned.
+BOOK_CACHE_ENABLED = (os.getenv("BOOK_CACHE_ENABLED") or "True").lower() == "true"
+BOOK_CACHE_TIMEOUT = int(os.getenv("BOOK_CACHE_TIMEOUT", 60 * 60))
+BOOK_AVAILABILITY_CACHE_TIMEOUT = 30
+
+# How long a copy set aside for a hold waits to be picked up
+HOLD_PICKUP_WINDOW = timedelta(hours=int(os.getenv("HOLD_PICKUP_WINDOW_HOURS", 48)))
+
+# How deep search results can be paged
+BOOK_SEARCH_MAX_RESULTS = 1000
+
+# Share of requests that record query count and timings (0.0 - 1.0)
+INSTRUMENTATION_SAMPLE_RATE = float(os.getenv("INSTRUMENTATION_SAMPLE_RATE", 0.05))
 
 SIMPLE_JWT = {
-    "AUTH_HEADER_NAME": "HTTP_AUTHORIZE"
+    "AUTH_HEADER_NAME": "HTTP_AUTHORIZE",
+    "TOKEN_OBTAIN_SERIALIZER": "user.authentication.ClaimsTokenObtainPairSerializer",
 }
 
+# Trust the id, email and is_staff claims of access tokens instead of
+# loading the user per request. Validated tokens are kept in a per-process
+# LRU, so a revocation reaches every process within AUTH_CLAIMS_CACHE_TTL.
+JWT_STATELESS_AUTH = (os.getenv("JWT_STATELESS_AUTH") or "True").lower() == "true"
+AUTH_CLAIMS_CACHE_SIZE = 10_000
+AUTH_CLAIMS_CACHE_TTL = 30
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Library Service API",
     "DESCRIPTION": "Borrow library books",
@@ -176,6 +253,14 @@ SPECTACULAR_SETTINGS = {
 }
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+# Point at stripe-mock or another stand-in, e.g. http://localhost:12111
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
+STRIPE_TIMEOUT = float(os.getenv("STRIPE_TIMEOUT", 10))
+STRIPE_POOL_SIZE = int(os.getenv("STRIPE_POOL_SIZE", 10))
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", 2))
+STRIPE_CIRCUIT_FAILURE_THRESHOLD = 5
+STRIPE_CIRCUIT_RESET_TIMEOUT = 30
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 
 
 # Celery settings
@@ -192,4 +277,16 @@ CELERY_BEAT_SCHEDULE = {
         "task": "borrowing.tasks.notify_overdue_borrowings",
         "schedule": crontab(hour="9", minute="0"),
     },
+    "relay_notification_outbox_every_5_seconds": {
+        "task": "borrowing.tasks.relay_notification_outbox",
+        "schedule": 5.0,
+    },
+    "apply_stripe_events_every_2_seconds": {
+        "task": "payment.tasks.apply_stripe_events",
+        "schedule": 2.0,
+    },
+    "expire_holds_every_minute": {
+        "task": "borrowing.tasks.expire_holds",
+        "schedule": 60.0,
+    },
 }
@@ -0,0 +1,56 @@
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from library_service.parsers import ORJSONParser
+from library_service.renderers import ORJSONRenderer
+
+
+class TestORJSONRendering(SimpleTestCase):
+    def setUp(self):
+        self.payload = ReturnDict(
+            {
+                "id": 1,
+                "book": "Line\u2028and paragraph\u2029separators, \u00e9",
+                "borrow_date": date(2024, 11, 1),
+                "paid_at": datetime(
+                    2024, 11, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc
+                ),
+                "money_to_pay": Decimal("12.50"),
+                "label": gettext_lazy("Book was successfully returned."),
+                "results": [None, True, 1.5, {2: "non-string key"}],
+            },
+            serializer=None,
+        )
+
+    def test_renderer_matches_drf(self):
+        self.assertEqual(
+            ORJSONRenderer().render(self.payload),
+            JSONRenderer().render(self.payload),
+        )
+
+    def test_renderer_matches_drf_when_indented(self):
+        context = {"indent": 4}
+        self.assertEqual(
+            ORJSONRenderer().render(self.payload, renderer_context=context),
+            JSONRenderer().render(self.payload, renderer_context=context),
+        )
+
+    def test_parser_round_trip(self):
+        body = JSONRenderer().render({"book": "\u00e9", "ids": [1, 2]})
+
+        self.assertEqual(
+            ORJSONParser().parse(BytesIO(body)), {"book": "\u00e9", "ids": [1, 2]}
+        )
+
+    def test_parser_rejects_invalid_json(self):
+        for body in (b"{", b'{"fee": NaN}'):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(BytesIO(body))
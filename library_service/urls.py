@@ -23,8 +23,15 @@ from drf_spectacular.views import (
     SpectacularRedocView,
 )
 
+from book.search import BookSearchView
+from borrowing import async_views as borrowing_async_views
+from library_service.instrumentation import metrics_view
+from payment import async_views as payment_async_views
+from payment.views import StripeWebhookView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/books/search/", BookSearchView.as_view(), name="book-search"),
     path("api/books/", include("book.urls", namespace="book")),
     path("api/borrowings/", include("borrowing.urls", namespace="borrowing")),
     path("api/users/", include("user.urls", namespace="user")),
@@ -39,5 +46,27 @@ urlpatterns = [
         SpectacularRedocView.as_view(url_name="schema"),
         name="redoc",
     ),
+    path("api/payments/webhook/", StripeWebhookView.as_view(), name="stripe-webhook"),
     path("api/payments/", include("payment.urls", namespace="payment")),
+    path("metrics", metrics_view, name="metrics"),
+    path(
+        "api/async/borrowings/",
+        borrowing_async_views.create_borrowing,
+        name="async-borrowing-create",
+    ),
+    path(
+        "api/async/borrowings/<int:pk>/return/",
+        borrowing_async_views.return_borrowing,
+        name="async-borrowing-return",
+    ),
+    path(
+        "api/async/payments/",
+        payment_async_views.create_payment,
+        name="async-payment-create",
+    ),
+    path(
+        "api/async/payments/success/",
+        payment_async_views.payment_success,
+        name="async-payment-success",
+    ),
 ]
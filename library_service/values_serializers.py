@@ -0,0 +1,119 @@
+from operator import itemgetter
+
+from django.shortcuts import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from library_service.instrumentation import timed_serializer_class
+
+
+def iso_date(value):
+    return value.isoformat()
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer for rows fetched with ``values()``.
+
+    ``fields`` is a sequence of ``(name, lookup, converter)``: the output
+    key, the ``values()`` lookup it is read from and an optional callable
+    applied to non-null values, mirroring the ``to_representation`` of
+    the DRF field it replaces. The row mapper is built once per class.
+    """
+
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.fields:
+            cls.map_row = staticmethod(cls.build_mapper(cls.fields))
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @staticmethod
+    def build_mapper(fields):
+        names = tuple(name for name, _, _ in fields)
+        lookups = tuple(lookup for _, lookup, _ in fields)
+        converters = tuple(
+            (name, converter) for name, _, converter in fields if converter
+        )
+        if len(lookups) == 1:
+            lookup = lookups[0]
+
+            def getter(row):
+                return (row[lookup],)
+
+        else:
+            getter = itemgetter(*lookups)
+
+        def map_row(row):
+            result = dict(zip(names, getter(row)))
+            for name, converter in converters:
+                value = result[name]
+                if value is not None:
+                    result[name] = converter(value)
+            return result
+
+        return map_row
+
+    @classmethod
+    def prepare_queryset(cls, queryset):
+        return queryset.values(*dict.fromkeys(lookup for _, lookup, _ in cls.fields))
+
+    def to_representation(self, instance):
+        if self.many:
+            return [self.map_row(row) for row in instance]
+        return self.map_row(instance)
+
+    @property
+    def data(self):
+        if self.many:
+            return ReturnList(self.to_representation(self.instance), serializer=self)
+        return ReturnDict(self.to_representation(self.instance), serializer=self)
+
+
+class ValuesSerializerMixin:
+    """
+    ViewSet mixin that serves the actions in ``values_serializer_classes``
+    (``list`` and ``retrieve``) straight from ``values()`` rows instead
+    of model instances and DRF fields. Other actions are unaffected.
+    """
+
+    values_serializer_classes = {}
+
+    def get_values_serializer_class(self):
+        serializer_class = self.values_serializer_classes.get(self.action)
+        if serializer_class is None:
+            return None
+        return timed_serializer_class(serializer_class)
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_values_serializer_class()
+        if serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = serializer_class.prepare_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer_class(page, many=True).data)
+        return Response(serializer_class(queryset, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer_class = self.get_values_serializer_class()
+        if serializer_class is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = serializer_class.prepare_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(request, row)
+        return Response(serializer_class(row).data)
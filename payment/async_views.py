@@ -0,0 +1,117 @@
+import stripe
+from asgiref.sync import sync_to_async
+from django.urls import reverse
+
+from borrowing.models import Borrowing
+from library_service.async_api import api_response, async_api_view
+from payment.gateway import PaymentGatewayUnavailable, get_gateway
+from payment.models import Payment
+from payment.serializers import PaymentCreateSerializer, PaymentSerializer
+from payment.views import attach_fine_session
+
+
+def _checkout_urls(request):
+    success_url = (
+        request.build_absolute_uri(reverse("payment:payment-success"))
+        + "?session_id={CHECKOUT_SESSION_ID}"
+    )
+    cancel_url = request.build_absolute_uri(reverse("payment:payment-cancel"))
+    return success_url, cancel_url
+
+
+@async_api_view(["POST"])
+async def create_payment(request, user, data):
+    serializer = PaymentCreateSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    amount = serializer.validated_data["money"]
+
+    borrowing = await Borrowing.objects.select_related("book").aget(
+        id=serializer.validated_data["borrowing_id"]
+    )
+    success_url, cancel_url = _checkout_urls(request)
+
+    money_to_pay = borrowing.get_fine_amount()
+    if money_to_pay is not None:
+        if await Payment.objects.filter(
+            borrowing=borrowing, type="FINE", status="PAID"
+        ).aexists():
+            return api_response(
+                {"error": "The fine for this borrowing is already paid."}, status=400
+            )
+        try:
+            session = await get_gateway().acreate_checkout_session(
+                borrowing_id=borrowing.id,
+                payment_type="FINE",
+                name=f"Fine for overdue: {borrowing.book.title}",
+                amount=money_to_pay,
+                success_url=success_url,
+                cancel_url=cancel_url,
+            )
+        except PaymentGatewayUnavailable as e:
+            return api_response({"error": str(e)}, status=503)
+        except stripe.error.StripeError as e:
+            return api_response({"error": str(e)}, status=400)
+
+        payment_fine = await sync_to_async(attach_fine_session)(
+            borrowing, money_to_pay, session
+        )
+
+        return api_response(
+            {
+                "fine_payment_id": payment_fine.id,
+                "session_url": session.url,
+                "amount": money_to_pay,
+            }
+        )
+
+    try:
+        session = await get_gateway().acreate_checkout_session(
+            borrowing_id=borrowing.id,
+            payment_type="PAYMENT",
+            name=borrowing.book.title,
+            amount=amount,
+            success_url=success_url,
+            cancel_url=cancel_url,
+        )
+    except PaymentGatewayUnavailable as e:
+        return api_response({"error": str(e)}, status=503)
+    except stripe.error.StripeError as e:
+        return api_response({"error": str(e)}, status=400)
+
+    payment, _ = await Payment.objects.aget_or_create(
+        session_id=session.id,
+        defaults={
+            "borrowing": borrowing,
+            "session_url": session.url,
+            "money_to_pay": amount,
+            "status": "PENDING",
+            "type": "PAYMENT",
+        },
+    )
+    return api_response(PaymentSerializer(payment).data, status=201)
+
+
+@async_api_view(["GET"], authentication_required=False)
+async def payment_success(request, user, data):
+    session_id = request.GET.get("session_id")
+    if not session_id:
+        return api_response({"error": "Session ID not provided."}, status=400)
+
+    if await Payment.objects.filter(session_id=session_id, status="PAID").aexists():
+        return api_response({"message": "Payment was successful and marked as paid."})
+
+    try:
+        session = await get_gateway().aretrieve_session(session_id)
+    except PaymentGatewayUnavailable as e:
+        return api_response({"error": str(e)}, status=503)
+    except stripe.error.StripeError as e:
+        return api_response({"error": str(e)}, status=400)
+
+    if session.payment_status != "paid":
+        return api_response({"message": "Payment not completed yet."}, status=400)
+
+    settled = await sync_to_async(Payment.settle_sessions)([session_id])
+    if not (settled or await Payment.objects.filter(session_id=session_id).aexists()):
+        raise Payment.DoesNotExist
+
+    return api_response({"message": "Payment was successful and marked as paid."})
@@ -0,0 +1,204 @@
+import hashlib
+import threading
+import time
+from functools import lru_cache
+from types import SimpleNamespace
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+from library_service.instrumentation import record_external
+
+SESSION_CACHE_KEY = "stripe:session:{}"
+PAID_SESSION_CACHE_TTL = 300
+OPEN_SESSION_CACHE_TTL = 5
+
+# Errors that say Stripe itself is unhealthy, as opposed to a bad request.
+TRANSIENT_ERRORS = (
+    stripe.error.APIConnectionError,
+    stripe.error.APIError,
+    stripe.error.RateLimitError,
+)
+
+
+class PaymentGatewayUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fail fast after ``failure_threshold`` consecutive transient errors and
+    let a single trial call through once ``reset_timeout`` has passed.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise PaymentGatewayUnavailable("Payment provider is unavailable.")
+            # half-open: allow this call, reopen on the next failure
+            self._opened_at = None
+            self._failures = self.failure_threshold - 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def idempotency_key(borrowing_id: int, payment_type: str, amount) -> str:
+    raw = f"checkout:{borrowing_id}:{payment_type}:{amount:.2f}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _session_status(session) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=session.id,
+        payment_status=session.payment_status,
+        amount_total=session.amount_total,
+        currency=session.currency,
+    )
+
+
+class StripeGateway:
+    """
+    Checkout sessions over pooled connections, with idempotency keys,
+    short-lived caching of retrieved sessions and a circuit breaker.
+    """
+
+    def __init__(self) -> None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings.STRIPE_POOL_SIZE,
+            pool_maxsize=settings.STRIPE_POOL_SIZE,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        if settings.STRIPE_API_BASE:
+            stripe.api_base = settings.STRIPE_API_BASE
+        stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+        stripe.default_http_client = stripe.RequestsClient(
+            timeout=settings.STRIPE_TIMEOUT,
+            session=session,
+            async_fallback_client=stripe.HTTPXClient(timeout=settings.STRIPE_TIMEOUT),
+        )
+        self.breaker = CircuitBreaker(
+            settings.STRIPE_CIRCUIT_FAILURE_THRESHOLD,
+            settings.STRIPE_CIRCUIT_RESET_TIMEOUT,
+        )
+
+    @staticmethod
+    def _checkout_params(name, amount, success_url, cancel_url) -> dict:
+        return dict(
+            payment_method_types=["card"],
+            line_items=[
+                {
+                    "price_data": {
+                        "currency": "usd",
+                        "product_data": {"name": name},
+                        "unit_amount": int(amount * 100),
+                    },
+                    "quantity": 1,
+                },
+            ],
+            mode="payment",
+            success_url=success_url,
+            cancel_url=cancel_url,
+        )
+
+    def _call(self, method, *args, **kwargs):
+        self.breaker.before_call()
+        try:
+            with record_external("stripe"):
+                result = method(*args, **kwargs)
+        except TRANSIENT_ERRORS:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _acall(self, method, *args, **kwargs):
+        self.breaker.before_call()
+        try:
+            with record_external("stripe"):
+                result = await method(*args, **kwargs)
+        except TRANSIENT_ERRORS:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    @staticmethod
+    def _cache_timeout(status) -> int:
+        if status.payment_status == "paid":
+            return PAID_SESSION_CACHE_TTL
+        return OPEN_SESSION_CACHE_TTL
+
+    def create_checkout_session(
+        self, *, borrowing_id, payment_type, name, amount, success_url, cancel_url
+    ):
+        return self._call(
+            stripe.checkout.Session.create,
+            idempotency_key=idempotency_key(borrowing_id, payment_type, amount),
+            **self._checkout_params(name, amount, success_url, cancel_url),
+        )
+
+    async def acreate_checkout_session(
+        self, *, borrowing_id, payment_type, name, amount, success_url, cancel_url
+    ):
+        return await self._acall(
+            stripe.checkout.Session.create_async,
+            idempotency_key=idempotency_key(borrowing_id, payment_type, amount),
+            **self._checkout_params(name, amount, success_url, cancel_url),
+        )
+
+    def retrieve_session(self, session_id: str) -> SimpleNamespace:
+        key = SESSION_CACHE_KEY.format(session_id)
+        cached = cache.get(key)
+        if cached is not None:
+            return SimpleNamespace(**cached)
+
+        status = _session_status(
+            self._call(stripe.checkout.Session.retrieve, session_id)
+        )
+        cache.set(key, vars(status), self._cache_timeout(status))
+        return status
+
+    async def aretrieve_session(self, session_id: str) -> SimpleNamespace:
+        key = SESSION_CACHE_KEY.format(session_id)
+        cached = await cache.aget(key)
+        if cached is not None:
+            return SimpleNamespace(**cached)
+
+        status = _session_status(
+            await self._acall(stripe.checkout.Session.retrieve_async, session_id)
+        )
+        await cache.aset(key, vars(status), self._cache_timeout(status))
+        return status
+
+
+@lru_cache(maxsize=None)
+def get_gateway() -> StripeGateway:
+    """
+    The process-wide gateway, built on first use so that importing this
+    module leaves the global ``stripe`` configuration alone.
+    """
+    return StripeGateway()
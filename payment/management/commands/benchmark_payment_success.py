@@ -0,0 +1,134 @@
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from book.models import Book
+from borrowing.models import Borrowing
+from payment.gateway import get_gateway
+from payment.models import Payment, PendingPaymentCounter
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure success-callback latency against a large payment table, "
+        "for the first callback of a session and for repeated ones. "
+        "Stripe is stubbed out and all rows are rolled back afterwards."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payments", type=int, default=10_000_000)
+        parser.add_argument("--borrowings", type=int, default=1000)
+        parser.add_argument("--callbacks", type=int, default=500)
+
+    def handle(self, *args, **options):
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            try:
+                with transaction.atomic():
+                    report = self._run(options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _run(self, options):
+        started = time.perf_counter()
+        self._seed(options["payments"], options["borrowings"])
+        self.stderr.write(
+            f"Seeded {options['payments']:,} payments "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        session_ids = [
+            f"cs_benchmark_{i}"
+            for i in random.sample(
+                range(options["payments"]),
+                min(options["callbacks"], options["payments"]),
+            )
+        ]
+        url = reverse("payment:payment-success")
+        client = Client()
+
+        def paid_session(session_id):
+            return SimpleNamespace(
+                id=session_id,
+                payment_status="paid",
+                amount_total=100,
+                currency="usd",
+            )
+
+        report = {
+            "payments": options["payments"],
+            "plan": Payment.objects.filter(session_id=session_ids[0]).explain(),
+        }
+        with patch.object(get_gateway(), "retrieve_session", side_effect=paid_session):
+            for name in ("first_callback", "repeat_callback"):
+                latencies = []
+                for session_id in session_ids:
+                    started = time.perf_counter()
+                    client.get(url, {"session_id": session_id})
+                    latencies.append(time.perf_counter() - started)
+                report[name] = self._percentiles(latencies)
+        return report
+
+    @staticmethod
+    def _seed(payments, borrowings):
+        user = get_user_model().objects.create_user(
+            email="success-benchmark@example.com", password="benchmark"
+        )
+        book = Book.objects.create(
+            title="Benchmark Book",
+            author="Benchmark Author",
+            cover="HARD",
+            inventory=borrowings,
+            daily_fee=1,
+        )
+        borrowing_ids = [
+            borrowing.id
+            for borrowing in Borrowing.objects.bulk_create(
+                Borrowing(
+                    book=book,
+                    user=user,
+                    expected_return_date=date.today() + timedelta(days=7),
+                )
+                for _ in range(borrowings)
+            )
+        ]
+
+        table = Payment._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                f"(status, type, borrowing_id, session_url, session_id, money_to_pay) "
+                f"SELECT 'PENDING', 'PAYMENT', "
+                f"(%s::bigint[])[1 + i %% %s], "
+                f"'https://checkout.stripe.com/c/pay/cs_benchmark_' || i, "
+                f"'cs_benchmark_' || i, 1 "
+                f"FROM generate_series(0, %s - 1) AS i",
+                [borrowing_ids, len(borrowing_ids), payments],
+            )
+            cursor.execute(f"ANALYZE {table}")
+        PendingPaymentCounter.increment(user.id, by=payments)
+
+    @staticmethod
+    def _percentiles(latencies):
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "p50_ms": round(percentiles[49] * 1000, 2),
+            "p99_ms": round(percentiles[98] * 1000, 2),
+        }
@@ -0,0 +1,155 @@
+import itertools
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import stripe
+from django.core.management.base import BaseCommand
+
+from payment.gateway import get_gateway
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """
+    Just enough of the Checkout Sessions API, including idempotency keys,
+    to stand in for stripe-mock.
+    """
+
+    delay = 0.05
+    sessions = {}
+    idempotent = {}
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def _respond(self, session):
+        payload = json.dumps(session).encode()
+        self.send_response(200 if session else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        key = self.headers.get("Idempotency-Key")
+
+        with self.lock:
+            session = self.idempotent.get(key) if key else None
+            if session is None:
+                session_id = f"cs_test_{next(self.counter)}"
+                session = {
+                    "id": session_id,
+                    "object": "checkout.session",
+                    "url": f"https://checkout.stripe.com/c/pay/{session_id}",
+                    "payment_status": "paid",
+                    "amount_total": 100,
+                    "currency": "usd",
+                }
+                self.sessions[session_id] = session
+                if key:
+                    self.idempotent[key] = session
+        self._respond(session)
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        self._respond(self.sessions.get(self.path.rsplit("/", 1)[-1], {}))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure checkout session latency and duplicate rate with retried "
+        "requests, with and without idempotency keys, against a local "
+        "Stripe stand-in."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--attempts", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=20)
+        parser.add_argument("--delay", type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        FakeStripeHandler.delay = options["delay"]
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stripe.api_base = f"http://127.0.0.1:{server.server_port}"
+        stripe.api_key = stripe.api_key or "sk_test_benchmark"
+
+        try:
+            report = {
+                "gateway": self._checkout(options, self._create_with_gateway),
+                "plain": self._checkout(options, self._create_plain),
+                "retrieve": self._retrieve(options),
+            }
+        finally:
+            server.shutdown()
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    def _create_with_gateway(borrowing_id):
+        return get_gateway().create_checkout_session(
+            borrowing_id=borrowing_id,
+            payment_type="PAYMENT",
+            name="Benchmark Book",
+            amount=Decimal("1.00"),
+            success_url="http://localhost/success",
+            cancel_url="http://localhost/cancel",
+        )
+
+    @staticmethod
+    def _create_plain(borrowing_id):
+        return stripe.checkout.Session.create(
+            mode="payment",
+            success_url="http://localhost/success",
+            cancel_url="http://localhost/cancel",
+        )
+
+    def _checkout(self, options, create):
+        latencies = []
+        session_ids = set()
+        offset = next(FakeStripeHandler.counter) * options["attempts"]
+
+        def attempt(index):
+            # every checkout is sent twice, as a client retry would
+            for _ in range(2):
+                started = time.perf_counter()
+                session = create(offset + index)
+                latencies.append(time.perf_counter() - started)
+                session_ids.add(session.id)
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            list(executor.map(attempt, range(options["attempts"])))
+
+        return {
+            "requests": len(latencies),
+            "checkouts": options["attempts"],
+            "duplicate_rate": round(
+                (len(session_ids) - options["attempts"]) / options["attempts"], 4
+            ),
+            **self._percentiles(latencies),
+        }
+
+    def _retrieve(self, options):
+        session_id = next(iter(FakeStripeHandler.sessions))
+        latencies = []
+        for _ in range(options["attempts"]):
+            started = time.perf_counter()
+            get_gateway().retrieve_session(session_id)
+            latencies.append(time.perf_counter() - started)
+        return self._percentiles(latencies)
+
+    @staticmethod
+    def _percentiles(latencies):
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "p50_ms": round(percentiles[49] * 1000, 2),
+            "p99_ms": round(percentiles[98] * 1000, 2),
+        }
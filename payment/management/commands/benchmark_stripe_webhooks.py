@@ -0,0 +1,145 @@
+import hashlib
+import hmac
+import json
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from book.models import Book
+from borrowing.models import Borrowing
+from payment.models import Payment
+from payment.tasks import apply_stripe_events
+
+BENCHMARK_WEBHOOK_SECRET = "whsec_benchmark"
+
+
+class Rollback(Exception):
+    pass
+
+
+def sign(payload: str, secret: str) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure webhook ingestion and batched apply throughput for "
+        "checkout.session.completed events, including redeliveries. "
+        "All rows are rolled back afterwards."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payments", type=int, default=2000)
+        parser.add_argument(
+            "--redeliveries",
+            type=int,
+            default=1,
+            help="Extra deliveries of every event.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with override_settings(
+            STRIPE_WEBHOOK_SECRET=BENCHMARK_WEBHOOK_SECRET,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        ):
+            try:
+                with transaction.atomic():
+                    report = self._run(options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _run(self, options):
+        session_ids = self._seed(options["payments"])
+        client = Client()
+        url = reverse("stripe-webhook")
+
+        deliveries = 0
+        started = time.perf_counter()
+        for _ in range(options["redeliveries"] + 1):
+            for session_id in session_ids:
+                payload = json.dumps(
+                    {
+                        "id": f"evt_{session_id}",
+                        "object": "event",
+                        "type": "checkout.session.completed",
+                        "data": {
+                            "object": {
+                                "id": session_id,
+                                "object": "checkout.session",
+                                "payment_status": "paid",
+                            }
+                        },
+                    }
+                )
+                client.post(
+                    url,
+                    payload,
+                    content_type="application/json",
+                    HTTP_STRIPE_SIGNATURE=sign(payload, BENCHMARK_WEBHOOK_SECRET),
+                )
+                deliveries += 1
+        ingest_duration = time.perf_counter() - started
+
+        started = time.perf_counter()
+        applied = apply_stripe_events(batch_size=options["batch_size"])
+        apply_duration = time.perf_counter() - started
+
+        return {
+            "deliveries": deliveries,
+            "ingest_per_second": round(deliveries / ingest_duration, 1),
+            "payments_applied": applied,
+            "apply_per_second": round(applied / apply_duration, 1),
+            "still_pending": Payment.objects.filter(
+                session_id__in=session_ids, status="PENDING"
+            ).count(),
+        }
+
+    @staticmethod
+    def _seed(count):
+        user = get_user_model().objects.create_user(
+            email="webhook-benchmark@example.com", password="benchmark"
+        )
+        book = Book.objects.create(
+            title="Benchmark Book",
+            author="Benchmark Author",
+            cover="HARD",
+            inventory=count,
+            daily_fee=1,
+        )
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                book=book,
+                user=user,
+                expected_return_date=date.today() + timedelta(days=7),
+            )
+            for _ in range(count)
+        )
+
+        session_ids = []
+        for borrowing in borrowings:
+            session_id = f"cs_benchmark_{borrowing.id}"
+            # one at a time so the pending counter stays in step
+            Payment.objects.create(
+                status="PENDING",
+                type="PAYMENT",
+                borrowing=borrowing,
+                session_url=f"https://checkout.stripe.com/c/pay/{session_id}",
+                session_id=session_id,
+                money_to_pay=1,
+            )
+            session_ids.append(session_id)
+        return session_ids
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from payment.models import Payment, PendingPaymentCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild per-user pending payment counters from the payment table "
+        "and report any drift."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drift, do not rewrite the counters.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            actual = dict(
+                Payment.objects.filter(status="PENDING")
+                .values_list("borrowing__user_id")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            stored = dict(
+                PendingPaymentCounter.objects.select_for_update().values_list(
+                    "user_id", "count"
+                )
+            )
+
+            drift = {
+                user_id: (stored.get(user_id, 0), actual.get(user_id, 0))
+                for user_id in actual.keys() | stored.keys()
+                if stored.get(user_id, 0) != actual.get(user_id, 0)
+            }
+
+            for user_id, (stored_count, actual_count) in sorted(drift.items()):
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"User {user_id}: counter {stored_count}, "
+                        f"actual {actual_count}"
+                    )
+                )
+
+            if drift and not options["dry_run"]:
+                PendingPaymentCounter.objects.bulk_create(
+                    [
+                        PendingPaymentCounter(user_id=user_id, count=actual_count)
+                        for user_id, (_, actual_count) in drift.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["user"],
+                    update_fields=["count"],
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {len(actual.keys() | stored.keys())} users, "
+                f"{len(drift)} drifted."
+                + (" Counters rebuilt." if drift and not options["dry_run"] else "")
+            )
+        )
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Payment = apps.get_model("payment", "Payment")
+    PendingPaymentCounter = apps.get_model("payment", "PendingPaymentCounter")
+
+    pending = (
+        Payment.objects.filter(status="PENDING")
+        .values("borrowing__user_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    PendingPaymentCounter.objects.bulk_create(
+        PendingPaymentCounter(user_id=row["borrowing__user_id"], count=row["count"])
+        for row in pending
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payment", "0005_payment_pending_borrowing_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingPaymentCounter",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="pending_payment_counter",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
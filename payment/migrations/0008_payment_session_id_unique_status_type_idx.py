@@ -0,0 +1,86 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:00
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+
+def resolve_duplicate_sessions(apps, schema_editor):
+    """
+    Leave one payment per checkout session, the paid one if there is one,
+    so that the unique index can be built. Pending duplicates repeat the
+    kept payment and are deleted; paid ones keep their record with the
+    session id cleared. Blank session ids are outside the index.
+    """
+    Payment = apps.get_model("payment", "Payment")
+    PendingPaymentCounter = apps.get_model("payment", "PendingPaymentCounter")
+
+    duplicated = list(
+        Payment.objects.exclude(session_id="")
+        .values("session_id")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("session_id", flat=True)
+    )
+    with transaction.atomic(using=schema_editor.connection.alias):
+        for session_id in duplicated:
+            payments = sorted(
+                Payment.objects.select_for_update()
+                .select_related("borrowing")
+                .filter(session_id=session_id),
+                key=lambda payment: (payment.status != "PAID", payment.id),
+            )
+            for payment in payments[1:]:
+                if payment.status == "PENDING":
+                    PendingPaymentCounter.objects.filter(
+                        user_id=payment.borrowing.user_id
+                    ).update(count=Greatest(F("count") - 1, 0))
+                    payment.delete()
+                else:
+                    payment.session_id = ""
+                    payment.save(update_fields=["session_id"])
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("payment", "0007_stripeevent"),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_duplicate_sessions, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=[
+                        # left INVALID by an earlier failed attempt
+                        "DROP INDEX CONCURRENTLY IF EXISTS "
+                        '"payment_session_id_unique"',
+                        "CREATE UNIQUE INDEX CONCURRENTLY "
+                        '"payment_session_id_unique" ON "payment_payment" '
+                        '("session_id") WHERE NOT ("session_id" = \'\')',
+                    ],
+                    reverse_sql='DROP INDEX CONCURRENTLY "payment_session_id_unique"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="payment",
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(("session_id", ""), _negated=True),
+                        fields=("session_id",),
+                        name="payment_session_id_unique",
+                    ),
+                ),
+            ],
+        ),
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(
+                fields=["status", "type"], name="payment_status_type_idx"
+            ),
+        ),
+    ]
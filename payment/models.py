@@ -1,4 +1,12 @@
-from django.db import models
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 
 
 class Payment(models.Model):
@@ -17,5 +25,191 @@ class Payment(models.Model):
     session_id = models.CharField(max_length=255)
     money_to_pay = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["borrowing"],
+                condition=models.Q(status="PENDING"),
+                name="payment_pending_borrowing_idx",
+            ),
+            models.Index(
+                fields=["status", "type"],
+                name="payment_status_type_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session_id"],
+                condition=~models.Q(session_id=""),
+                name="payment_session_id_unique",
+            ),
+        ]
+
     def __str__(self):
         return f"Payment {self.id} - {self.status}"
+
+    def get_user_id(self) -> int:
+        if Payment.borrowing.is_cached(self):
+            return self.borrowing.user_id
+
+        borrowing = apps.get_model("borrowing", "Borrowing")
+        return borrowing.objects.values_list("user_id", flat=True).get(
+            pk=self.borrowing_id
+        )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if not self._state.adding and (
+            update_fields is not None and "status" not in update_fields
+        ):
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic(savepoint=False):
+            was_pending = (
+                not self._state.adding
+                and Payment.objects.filter(pk=self.pk, status="PENDING").exists()
+            )
+            super().save(*args, **kwargs)
+            if self.status == "PENDING" and not was_pending:
+                PendingPaymentCounter.increment(self.get_user_id())
+            elif was_pending and self.status != "PENDING":
+                PendingPaymentCounter.decrement(self.get_user_id())
+
+    @classmethod
+    def settle_sessions(cls, session_ids) -> list[tuple]:
+        """
+        Mark the pending payments of the given checkout sessions as paid
+        with one conditional UPDATE, then settle the pending counters and
+        queue the notifications. Returns (payment id, amount, borrowing id,
+        user id, user email, book title) for every payment that changed.
+        """
+        payment = cls._meta.db_table
+        borrowing = apps.get_model("borrowing", "Borrowing")._meta.db_table
+        user = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+        book = apps.get_model("book", "Book")._meta.db_table
+        outbox = apps.get_model("borrowing", "NotificationOutbox")
+
+        with transaction.atomic(savepoint=False):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {payment} SET status = 'PAID' "
+                    f"FROM {borrowing}, {user}, {book} "
+                    f"WHERE {payment}.borrowing_id = {borrowing}.id "
+                    f"AND {borrowing}.user_id = {user}.id "
+                    f"AND {borrowing}.book_id = {book}.id "
+                    f"AND {payment}.session_id = ANY(%s) "
+                    f"AND {payment}.status = 'PENDING' "
+                    f"RETURNING {payment}.id, {payment}.money_to_pay, "
+                    f"{borrowing}.id, {user}.id, {user}.email, {book}.title",
+                    [list(session_ids)],
+                )
+                paid = cursor.fetchall()
+
+            if paid:
+                PendingPaymentCounter.decrement_many(
+                    Counter(user_id for _, _, _, user_id, _, _ in paid)
+                )
+                outbox.objects.bulk_create(
+                    outbox(
+                        message=(
+                            f"Payment Successful:\n"
+                            f"*Payment ID: {payment_id}\n"
+                            f"*Amount: {amount} USD\n"
+                            f"*User email: {email}\n"
+                            f"*Book title: {title}\n"
+                            f"*Borrowing ID: {borrowing_id}\n"
+                        )
+                    )
+                    for payment_id, amount, borrowing_id, _, email, title in paid
+                )
+        return paid
+
+
+class PendingPaymentCounter(models.Model):
+    """
+    Number of outstanding payments per user, kept in step with Payment
+    so that checkout eligibility is a single primary key lookup.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="pending_payment_counter",
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"User {self.user_id} - {self.count} pending"
+
+    @classmethod
+    def increment(cls, user_id: int, by: int = 1) -> None:
+        table = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, count) VALUES (%s, %s) "
+                f"ON CONFLICT (user_id) DO UPDATE "
+                f"SET count = {table}.count + EXCLUDED.count",
+                [user_id, by],
+            )
+
+    @classmethod
+    def decrement(cls, user_id: int, by: int = 1) -> None:
+        cls.objects.filter(user_id=user_id).update(count=Greatest(F("count") - by, 0))
+
+    @classmethod
+    def decrement_many(cls, counts: dict) -> None:
+        """
+        Decrement several users' counters in one statement.
+        ``counts`` maps user id to the number of payments settled.
+        """
+        if not counts:
+            return
+
+        table = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS counter "
+                f"SET count = GREATEST(counter.count - settled.count, 0) "
+                f"FROM (SELECT unnest(%s::bigint[]) AS user_id, "
+                f"unnest(%s::integer[]) AS count) AS settled "
+                f"WHERE counter.user_id = settled.user_id",
+                [list(counts.keys()), list(counts.values())],
+            )
+
+    @classmethod
+    def has_pending(cls, user_id: int) -> bool:
+        return cls.objects.filter(user_id=user_id, count__gt=0).exists()
+
+
+class StripeEvent(models.Model):
+    """
+    Inbox of verified Stripe webhook events, unique by event id so that
+    redelivered events are dropped on insert.
+    """
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=255)
+    session_id = models.CharField(max_length=255)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="stripe_event_unprocessed_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
+
+
+@receiver(pre_delete, sender=Payment)
+def release_pending_on_delete(sender, instance, **kwargs):
+    # Sent inside the deletion's transaction, also for cascades from
+    # Borrowing and User, while the borrowing row can still be read.
+    if instance.status == "PENDING":
+        PendingPaymentCounter.decrement(instance.get_user_id())
@@ -0,0 +1,41 @@
+import logging
+
+from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+
+from payment.models import Payment, StripeEvent
+
+STRIPE_EVENT_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def apply_stripe_events(batch_size=STRIPE_EVENT_BATCH_SIZE):
+    """
+    Apply queued checkout.session.completed events in batches, settling
+    each batch's payments with Payment.settle_sessions.
+    """
+    applied = 0
+
+    while True:
+        with transaction.atomic():
+            events = list(
+                StripeEvent.objects.filter(processed_at__isnull=True)
+                .order_by("id")
+                .select_for_update(skip_locked=True)
+                .values_list("id", "session_id")[:batch_size]
+            )
+            if not events:
+                break
+
+            paid = Payment.settle_sessions({session_id for _, session_id in events})
+            StripeEvent.objects.filter(id__in=[id for id, _ in events]).update(
+                processed_at=timezone.now()
+            )
+            applied += len(paid)
+
+    if applied:
+        logger.info("Marked %s payments as paid from Stripe events", applied)
+    return applied
@@ -6,9 +6,45 @@ from django.contrib.auth import get_user_model
 from unittest.mock import patch
 from borrowing.models import Borrowing
 from book.models import Book
-from payment.models import Payment
+from payment.gateway import CircuitBreaker, PaymentGatewayUnavailable
+from payment.models import Payment, PendingPaymentCounter, StripeEvent
+from payment.tasks import apply_stripe_events
+from django.core.management import call_command
+from io import StringIO
 from datetime import timedelta
 from django.utils import timezone
+from django.test import override_settings
+from django.db import IntegrityError, transaction
+import hashlib
+import hmac
+import json
+import time
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+def signed_webhook(event):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return payload, f"t={timestamp},v1={signature}"
+
+
+def checkout_completed_event(event_id, session_id):
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "id": session_id,
+                "object": "checkout.session",
+                "payment_status": "paid",
+            }
+        },
+    }
 
 
 class PaymentTestCase(TestCase):
@@ -83,6 +119,52 @@ class PaymentTestCase(TestCase):
         self.assertEqual(payment.status, "PENDING")
         self.assertEqual(payment.type, "FINE")
 
+    @patch("stripe.checkout.Session.create")
+    def test_paid_fine_is_not_charged_again(self, mock_create):
+        self.borrowing.actual_return_date = timezone.now() + timedelta(days=10)
+        self.borrowing.save()
+        Payment.objects.create(
+            borrowing=self.borrowing,
+            session_url="http://test.com/session",
+            session_id="test_session_id",
+            money_to_pay=100,
+            status="PAID",
+            type="FINE",
+        )
+
+        response = self.client.post(
+            self.payment_url, {"borrowing_id": self.borrowing.id, "money": 100}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        mock_create.assert_not_called()
+        self.assertEqual(Payment.objects.filter(borrowing=self.borrowing).count(), 1)
+        self.assertFalse(PendingPaymentCounter.has_pending(self.user.id))
+
+    @patch("stripe.checkout.Session.create")
+    def test_retried_fine_reuses_session_row(self, mock_create):
+        mock_create.return_value = type(
+            "Session", (object,), {
+                "id": "test_session_id",
+                "url": "http://test.com/session",
+                "payment_status": "pending"
+            }
+        )
+        self.borrowing.actual_return_date = timezone.now() + timedelta(days=10)
+        self.borrowing.save()
+        data = {"borrowing_id": self.borrowing.id, "money": 100}
+
+        first = self.client.post(self.payment_url, data)
+        second = self.client.post(self.payment_url, data)
+
+        self.assertEqual(
+            first.data["fine_payment_id"], second.data["fine_payment_id"]
+        )
+        self.assertEqual(
+            Payment.objects.filter(session_id="test_session_id").count(), 1
+        )
+        self.assertEqual(PendingPaymentCounter.objects.get(user=self.user).count, 1)
+
     @patch("stripe.checkout.Session.create")
     @patch("stripe.checkout.Session.retrieve")
     def test_payment_success(self, mock_retrieve, mock_create):
@@ -110,6 +192,237 @@ class PaymentTestCase(TestCase):
         payment.refresh_from_db()
         self.assertEqual(payment.status, "PAID")
 
+    @patch("stripe.checkout.Session.retrieve")
+    def test_pending_counter_follows_payment_status(self, mock_retrieve):
+        Payment.objects.create(
+            borrowing=self.borrowing,
+            session_url="http://test.com/session",
+            session_id="test_session_id",
+            money_to_pay=15.00,
+            status="PENDING",
+            type="PAYMENT",
+        )
+        self.assertTrue(PendingPaymentCounter.has_pending(self.user.id))
+
+        mock_retrieve.return_value = type(
+            "Session", (object,), {"id": "test_session_id", "payment_status": "paid", "amount_total": 100, "currency": "USD"}
+        )
+        success_url = reverse("payment:payment-success") + "?session_id=test_session_id"
+        self.client.get(success_url)
+        self.client.get(success_url)
+
+        self.assertFalse(PendingPaymentCounter.has_pending(self.user.id))
+        self.assertEqual(
+            PendingPaymentCounter.objects.get(user=self.user).count, 0
+        )
+
+    @patch("stripe.checkout.Session.retrieve")
+    def test_payment_success_unknown_session_returns_404(self, mock_retrieve):
+        mock_retrieve.return_value = type(
+            "Session", (object,), {"id": "unknown_session_id", "payment_status": "paid"}
+        )
+        success_url = (
+            reverse("payment:payment-success") + "?session_id=unknown_session_id"
+        )
+        response = self.client.get(success_url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pending_counter_follows_save_and_delete(self):
+        payment = Payment.objects.create(
+            borrowing=self.borrowing,
+            session_url="http://test.com/session",
+            session_id="test_session_id",
+            money_to_pay=15.00,
+            status="PENDING",
+            type="PAYMENT",
+        )
+        payment.status = "PAID"
+        payment.save()
+        self.assertFalse(PendingPaymentCounter.has_pending(self.user.id))
+
+        payment.status = "PENDING"
+        payment.save()
+        self.assertTrue(PendingPaymentCounter.has_pending(self.user.id))
+
+        self.borrowing.delete()
+        self.assertFalse(PendingPaymentCounter.has_pending(self.user.id))
+
+    def test_pending_payment_blocks_borrowing(self):
+        PendingPaymentCounter.increment(self.user.id)
+
+        response = self.client.post(
+            reverse("borrowing:borrowing-list"),
+            {
+                "book": self.book.id,
+                "expected_return_date": timezone.now().date() + timedelta(days=5),
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reconcile_pending_payments(self):
+        Payment.objects.create(
+            borrowing=self.borrowing,
+            session_url="http://test.com/session",
+            session_id="test_session_id",
+            money_to_pay=15.00,
+            status="PENDING",
+            type="PAYMENT",
+        )
+        PendingPaymentCounter.objects.filter(user=self.user).update(count=5)
+        out = StringIO()
+
+        call_command("reconcile_pending_payments", stdout=out)
+
+        self.assertIn("1 drifted", out.getvalue())
+        self.assertEqual(PendingPaymentCounter.objects.get(user=self.user).count, 1)
+
+    @patch("stripe.checkout.Session.create")
+    def test_retried_payment_is_idempotent(self, mock_create):
+        mock_create.return_value = type(
+            "Session", (object,), {
+                "id": "test_session_id",
+                "url": "http://test.com/session",
+                "payment_status": "pending"
+            }
+        )
+        data = {"borrowing_id": self.borrowing.id, "money": 20.00}
+
+        self.client.post(self.payment_url, data)
+        self.client.post(self.payment_url, data)
+
+        self.assertEqual(Payment.objects.filter(borrowing=self.borrowing).count(), 1)
+        keys = {call.kwargs["idempotency_key"] for call in mock_create.call_args_list}
+        self.assertEqual(len(keys), 1)
+
+    def test_session_id_is_unique_when_set(self):
+        fields = {
+            "borrowing": self.borrowing,
+            "session_url": "http://test.com/session",
+            "money_to_pay": 15.00,
+            "status": "PAID",
+            "type": "FINE",
+        }
+        Payment.objects.create(session_id="", **fields)
+        Payment.objects.create(session_id="", **fields)
+        Payment.objects.create(session_id="test_session_id", **fields)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Payment.objects.create(session_id="test_session_id", **fields)
+
+    @patch("stripe.checkout.Session.retrieve")
+    def test_retrieved_session_is_cached(self, mock_retrieve):
+        mock_retrieve.return_value = type(
+            "Session", (object,), {"id": "cached_session_id", "payment_status": "paid", "amount_total": 100, "currency": "USD"}
+        )
+        success_url = reverse("payment:payment-success") + "?session_id=cached_session_id"
+
+        self.client.get(success_url)
+        self.client.get(success_url)
+
+        mock_retrieve.assert_called_once_with("cached_session_id")
+
+    def test_circuit_breaker_opens_after_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+
+        with self.assertRaises(PaymentGatewayUnavailable):
+            breaker.before_call()
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+    def test_webhook_queues_event_once(self):
+        payload, signature = signed_webhook(
+            checkout_completed_event("evt_1", "session_1")
+        )
+        url = reverse("stripe-webhook")
+
+        for _ in range(2):
+            response = self.client.post(
+                url,
+                payload,
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE=signature,
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(StripeEvent.objects.filter(event_id="evt_1").count(), 1)
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+    def test_webhook_rejects_invalid_signature(self):
+        payload, _ = signed_webhook(checkout_completed_event("evt_1", "session_1"))
+
+        response = self.client.post(
+            reverse("stripe-webhook"),
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE="t=1,v1=invalid",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    @patch("stripe.checkout.Session.retrieve")
+    def test_apply_stripe_events_marks_payments_paid(self, mock_retrieve):
+        payment = Payment.objects.create(
+            status="PENDING",
+            type="PAYMENT",
+            borrowing=self.borrowing,
+            session_url="http://example.com",
+            session_id="session_1",
+            money_to_pay=25.00,
+        )
+        StripeEvent.objects.create(
+            event_id="evt_1",
+            type="checkout.session.completed",
+            session_id="session_1",
+        )
+        StripeEvent.objects.create(
+            event_id="evt_2",
+            type="checkout.session.completed",
+            session_id="session_1",
+        )
+
+        self.assertEqual(apply_stripe_events(), 1)
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "PAID")
+        self.assertFalse(PendingPaymentCounter.has_pending(self.user.id))
+        self.assertFalse(
+            StripeEvent.objects.filter(processed_at__isnull=True).exists()
+        )
+
+        response = self.client.get(
+            reverse("payment:payment-success"), {"session_id": "session_1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_retrieve.assert_not_called()
+
+    def test_payment_export_requires_staff(self):
+        url = reverse("payment:payment-export", kwargs={"file_format": "csv"})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        Payment.objects.create(
+            borrowing=self.borrowing,
+            session_url="http://test.com/session",
+            session_id="test_session_id",
+            money_to_pay=15.00,
+            status="PENDING",
+            type="PAYMENT",
+        )
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("test_session_id", lines[1])
+
     def test_payment_cancel(self):
         cancel_url = reverse("payment:payment-cancel")
         response = self.client.get(cancel_url)
@@ -1,29 +1,43 @@
 import stripe
-from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
-from rest_framework import status
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from borrowing.models import Borrowing
-from payment.models import Payment
+from library_service.export import stream_export
+from library_service.instrumentation import InstrumentedViewMixin
+from library_service.pagination import PaymentPagination
+from payment.gateway import PaymentGatewayUnavailable, get_gateway
+from payment.models import Payment, StripeEvent
 from payment.serializers import PaymentSerializer, PaymentCreateSerializer
-from telegram_bot import send_borrowing_notification
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-FINE_MULTIPLIER = 2
+
+PAYMENT_EXPORT_FIELDS = {
+    "id": "id",
+    "status": "status",
+    "type": "type",
+    "borrowing": "borrowing_id",
+    "session_url": "session_url",
+    "session_id": "session_id",
+    "money_to_pay": "money_to_pay",
+}
 
 
 @extend_schema(request=PaymentCreateSerializer)
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaymentPagination
 
     def create(self, request, *args, **kwargs):
         serializer = PaymentCreateSerializer(data=request.data)
@@ -33,58 +47,42 @@ class PaymentViewSet(viewsets.ModelViewSet):
         borrowing_id = serializer.validated_data["borrowing_id"]
         amount = serializer.validated_data["money"]
 
-        borrowing = get_object_or_404(Borrowing, id=borrowing_id)
-
-        if (
-            borrowing.actual_return_date
-            and borrowing.actual_return_date > borrowing.expected_return_date
-        ):
-            overdue_days = (
-                borrowing.actual_return_date - borrowing.expected_return_date
-            ).days
-            daily_fee = borrowing.book.daily_fee
-            money_to_pay = overdue_days * daily_fee * FINE_MULTIPLIER
-
-            payment_fine = Payment.objects.create(
-                borrowing=borrowing,
-                session_url="",
-                session_id="",
-                money_to_pay=money_to_pay,
-                status="PENDING",
-                type="FINE",
-            )
+        borrowing = get_object_or_404(
+            Borrowing.objects.select_related("book"), id=borrowing_id
+        )
 
-            success_url = (
-                request.build_absolute_uri(reverse("payment:payment-success"))
-                + "?session_id={CHECKOUT_SESSION_ID}"
-            )
-            cancel_url = request.build_absolute_uri(reverse("payment:payment-cancel"))
+        success_url = (
+            request.build_absolute_uri(reverse("payment:payment-success"))
+            + "?session_id={CHECKOUT_SESSION_ID}"
+        )
+        cancel_url = request.build_absolute_uri(reverse("payment:payment-cancel"))
 
+        money_to_pay = borrowing.get_fine_amount()
+        if money_to_pay is not None:
+            if Payment.objects.filter(
+                borrowing=borrowing, type="FINE", status="PAID"
+            ).exists():
+                return Response(
+                    {"error": "The fine for this borrowing is already paid."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
             try:
-                session = stripe.checkout.Session.create(
-                    payment_method_types=["card"],
-                    line_items=[
-                        {
-                            "price_data": {
-                                "currency": "usd",
-                                "product_data": {
-                                    "name": f"Fine for overdue: {borrowing.book.title}",
-                                },
-                                "unit_amount": int(money_to_pay * 100),
-                            },
-                            "quantity": 1,
-                        },
-                    ],
-                    mode="payment",
+                session = get_gateway().create_checkout_session(
+                    borrowing_id=borrowing.id,
+                    payment_type="FINE",
+                    name=f"Fine for overdue: {borrowing.book.title}",
+                    amount=money_to_pay,
                     success_url=success_url,
                     cancel_url=cancel_url,
                 )
+            except PaymentGatewayUnavailable as e:
+                return Response(
+                    {"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
             except stripe.error.StripeError as e:
                 return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            payment_fine.session_url = session.url
-            payment_fine.session_id = session.id
-            payment_fine.save()
+            payment_fine = attach_fine_session(borrowing, money_to_pay, session)
 
             return Response(
                 {
@@ -95,46 +93,93 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_200_OK,
             )
 
-        success_url = (
-            request.build_absolute_uri(reverse("payment:payment-success"))
-            + "?session_id={CHECKOUT_SESSION_ID}"
-        )
-        cancel_url = request.build_absolute_uri(reverse("payment:payment-cancel"))
-
         try:
-            session = stripe.checkout.Session.create(
-                payment_method_types=["card"],
-                line_items=[
-                    {
-                        "price_data": {
-                            "currency": "usd",
-                            "product_data": {
-                                "name": borrowing.book.title,
-                            },
-                            "unit_amount": int(amount * 100),
-                        },
-                        "quantity": 1,
-                    },
-                ],
-                mode="payment",
+            session = get_gateway().create_checkout_session(
+                borrowing_id=borrowing.id,
+                payment_type="PAYMENT",
+                name=borrowing.book.title,
+                amount=amount,
                 success_url=success_url,
                 cancel_url=cancel_url,
             )
+        except PaymentGatewayUnavailable as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except stripe.error.StripeError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        payment = Payment.objects.create(
-            borrowing=borrowing,
-            session_url=session.url,
+        payment, _ = Payment.objects.get_or_create(
             session_id=session.id,
-            money_to_pay=amount,
-            status="PENDING",
-            type="PAYMENT",
+            defaults={
+                "borrowing": borrowing,
+                "session_url": session.url,
+                "money_to_pay": amount,
+                "status": "PENDING",
+                "type": "PAYMENT",
+            },
         )
 
         serializer = self.get_serializer(payment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @extend_schema(
+        description="Staff only. Stream all payments as CSV or NDJSON",
+        responses={
+            (200, "text/csv"): OpenApiTypes.STR,
+            (200, "application/x-ndjson"): OpenApiTypes.STR,
+        },
+    )
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path=r"export/(?P<file_format>csv|ndjson)",
+        url_name="export",
+        permission_classes=(IsAdminUser,),
+    )
+    def export(self, request, file_format=None):
+        return stream_export(
+            Payment.objects.order_by("id"),
+            PAYMENT_EXPORT_FIELDS,
+            file_format,
+            "payments",
+        )
+
+
+def attach_fine_session(borrowing, money_to_pay, session) -> Payment:
+    """
+    Attach a checkout session to the borrowing's outstanding fine, creating
+    the fine if the return flow has not. Retries with the same session
+    reuse the row already holding it, whatever its status.
+    """
+    with transaction.atomic():
+        payment_fine = Payment.objects.filter(session_id=session.id).first()
+        if payment_fine is not None:
+            return payment_fine
+
+        payment_fine = (
+            Payment.objects.select_for_update()
+            .filter(borrowing=borrowing, type="FINE", status="PENDING", session_id="")
+            .first()
+        )
+        if payment_fine is None:
+            payment_fine, _ = Payment.objects.get_or_create(
+                session_id=session.id,
+                defaults={
+                    "borrowing": borrowing,
+                    "session_url": session.url,
+                    "money_to_pay": money_to_pay,
+                    "status": "PENDING",
+                    "type": "FINE",
+                },
+            )
+            return payment_fine
+
+        payment_fine.session_url = session.url
+        payment_fine.session_id = session.id
+        payment_fine.save(update_fields=["session_url", "session_id"])
+        return payment_fine
+
 
 @extend_schema(responses={200: PaymentSerializer})
 class PaymentSuccessView(APIView):
@@ -146,42 +191,79 @@ class PaymentSuccessView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            session = stripe.checkout.Session.retrieve(session_id)
-            if session.payment_status == "paid":
-                payment = get_object_or_404(
-                    Payment.objects.select_related(
-                        "borrowing__user",
-                        "borrowing__book"
-                    ),
-                    session_id=session_id
-                )
-                payment.status = "PAID"
-                payment.save()
-                message = (
-                    f"Payment Successful:\n"
-                    f"*Payment ID: {payment.id}\n"
-                    f"*Amount: {session.amount_total / 100} {session.currency.upper()}\n"
-                    f"*User email: {payment.borrowing.user.email}\n"
-                    f"*Book title: {payment.borrowing.book.title}\n"
-                    f"*Borrowing ID: {payment.borrowing.id}\n"
-                )
-                async_to_sync(send_borrowing_notification)(message)
+        if Payment.objects.filter(session_id=session_id, status="PAID").exists():
+            return Response(
+                {"message": "Payment was successful and marked as paid."},
+                status=status.HTTP_200_OK,
+            )
 
-                return Response(
-                    {"message": "Payment was successful and marked as paid."},
-                    status=status.HTTP_200_OK,
-                )
-            else:
-                return Response(
-                    {"message": "Payment not completed yet."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+        try:
+            session = get_gateway().retrieve_session(session_id)
+        except PaymentGatewayUnavailable as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except stripe.error.StripeError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        if session.payment_status != "paid":
+            return Response(
+                {"message": "Payment not completed yet."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not (
+            Payment.settle_sessions([session_id])
+            or Payment.objects.filter(session_id=session_id).exists()
+        ):
+            raise Http404("No Payment matches the given query.")
+
+        return Response(
+            {"message": "Payment was successful and marked as paid."},
+            status=status.HTTP_200_OK,
+        )
+
+
+@extend_schema(exclude=True)
+class StripeWebhookView(APIView):
+    """
+    Verify Stripe's signature and queue completed checkout sessions for
+    apply_stripe_events. Redelivered events are dropped by event id.
+    """
+
+    authentication_classes = ()
+    permission_classes = ()
+
+    def post(self, request):
+        try:
+            event = stripe.Webhook.construct_event(
+                request.body,
+                request.META.get("HTTP_STRIPE_SIGNATURE", ""),
+                settings.STRIPE_WEBHOOK_SECRET,
+            )
+        except (ValueError, stripe.error.SignatureVerificationError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        session = event["data"]["object"]
+        if (
+            event["type"] == "checkout.session.completed"
+            and session.get("payment_status") == "paid"
+        ):
+            StripeEvent.objects.bulk_create(
+                [
+                    StripeEvent(
+                        event_id=event["id"],
+                        type=event["type"],
+                        session_id=session["id"],
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+
+        return Response(status=status.HTTP_200_OK)
+
 
 @extend_schema(responses={200: PaymentSerializer})
 class PaymentCancelView(APIView):
@@ -39,16 +39,6 @@ router = Router()
 dp.include_router(router)
 
 
-async def send_borrowing_notification(message: str) -> None:
-    """
-    Func to send messages to telegram
-    """
-    try:
-        await bot.send_message(chat_id=CHAT_ID, text=message)
-    except Exception as e:
-        logging.error(f"Failed to send message: {e}")
-
-
 async def main() -> None:
     """
     Main func to run dispatcher
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from os import getenv
+
+import httpx
+from dotenv import load_dotenv
+
+from library_service.instrumentation import record_external
+
+load_dotenv()
+TOKEN = getenv("BOT_TOKEN")
+CHAT_ID = getenv("CHAT_ID")
+TEST_MODE = getenv("TEST_MODE", "False").lower() == "true"
+TELEGRAM_API_URL = getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+# Telegram allows ~30 messages per second overall, one message per second
+# to a private chat and 20 messages per minute to a group.
+GLOBAL_RATE = 30
+PRIVATE_CHAT_RATE = 1
+GROUP_CHAT_RATE = 20 / 60
+GROUP_CHAT_BURST = 20
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramDeliveryError(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; ``acquire`` blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def chat_bucket(chat_id) -> TokenBucket:
+    if str(chat_id).startswith("-"):
+        return TokenBucket(GROUP_CHAT_RATE, GROUP_CHAT_BURST)
+    return TokenBucket(PRIVATE_CHAT_RATE, 1)
+
+
+class TelegramClient:
+    """
+    Telegram Bot API client that keeps a pooled HTTP connection,
+    respects Telegram's rate limits and retries throttled requests.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = TELEGRAM_API_URL,
+        timeout: float = 10.0,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_connections: int = 10,
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._http = httpx.Client(
+            base_url=f"{base_url}/bot{token}",
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self._global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._chat_buckets = {}
+        self._chat_buckets_lock = threading.Lock()
+
+    def _bucket_for(self, chat_id) -> TokenBucket:
+        with self._chat_buckets_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._chat_buckets[chat_id] = chat_bucket(chat_id)
+            return bucket
+
+    def send_message(self, text: str, chat_id=None) -> dict:
+        chat_id = chat_id or CHAT_ID
+        chat_limiter = self._bucket_for(chat_id)
+
+        for attempt in range(self.max_retries + 1):
+            chat_limiter.acquire()
+            self._global_bucket.acquire()
+
+            try:
+                with record_external("telegram"):
+                    response = self._http.post(
+                        "/sendMessage", json={"chat_id": chat_id, "text": text}
+                    )
+            except httpx.TransportError as e:
+                logger.warning(f"Telegram request failed: {e}")
+                time.sleep(self.backoff * 2**attempt)
+                continue
+
+            if response.status_code == 429:
+                retry_after = (
+                    response.json().get("parameters", {}).get("retry_after", 0)
+                )
+                time.sleep(max(retry_after, self.backoff * 2**attempt))
+                continue
+
+            if response.status_code >= 500:
+                time.sleep(self.backoff * 2**attempt)
+                continue
+
+            if response.is_error:
+                raise TelegramDeliveryError(response.text)
+
+            return response.json()
+
+        raise TelegramDeliveryError(
+            f"Message was not delivered after {self.max_retries} retries."
+        )
+
+    def close(self) -> None:
+        self._http.close()
+
+
+class MockTelegramClient:
+    def send_message(self, text: str, chat_id=None) -> dict:
+        logger.info(f"Mock client sending message to {chat_id or CHAT_ID}: {text}")
+        return {"ok": True}
+
+    def close(self) -> None:
+        pass
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_telegram_client():
+    """
+    Return the process-wide client, creating it on first use so that
+    forked Celery workers each open their own connection pool.
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = MockTelegramClient() if TEST_MODE else TelegramClient(TOKEN)
+        return _client
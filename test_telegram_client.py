@@ -0,0 +1,72 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from telegram_client import TelegramClient, TelegramDeliveryError
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    responses = []
+    received = []
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        self.received.append(json.loads(self.rfile.read(length)))
+        status_code, body = self.responses.pop(0)
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTelegramClient(SimpleTestCase):
+    def setUp(self):
+        FakeTelegramHandler.responses = []
+        FakeTelegramHandler.received = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegramHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = TelegramClient(
+            "test-token",
+            base_url=f"http://127.0.0.1:{self.server.server_port}",
+            max_retries=2,
+            backoff=0.01,
+        )
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_send_message(self):
+        FakeTelegramHandler.responses = [(200, {"ok": True, "result": {}})]
+
+        result = self.client.send_message("hello", chat_id="1")
+
+        self.assertTrue(result["ok"])
+        self.assertEqual(
+            FakeTelegramHandler.received, [{"chat_id": "1", "text": "hello"}]
+        )
+
+    def test_retries_after_throttling(self):
+        FakeTelegramHandler.responses = [
+            (429, {"ok": False, "parameters": {"retry_after": 0}}),
+            (200, {"ok": True, "result": {}}),
+        ]
+
+        result = self.client.send_message("hello", chat_id="-100")
+
+        self.assertTrue(result["ok"])
+        self.assertEqual(len(FakeTelegramHandler.received), 2)
+
+    def test_gives_up_after_max_retries(self):
+        FakeTelegramHandler.responses = [(500, {"ok": False})] * 3
+
+        with self.assertRaises(TelegramDeliveryError):
+            self.client.send_message("hello", chat_id="-100")
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+REVOKED_KEY = "auth:revoked:{}"
+# User fields copied into tokens; changing any of them revokes the tokens
+CLAIM_FIELDS = ("email", "is_staff", "is_active", "password")
+
+logger = logging.getLogger(__name__)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Embed the claims ``ClaimsJWTAuthentication`` trusts in the refresh
+    token; access tokens issued from it inherit them.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["email"] = user.email
+        token["is_staff"] = user.is_staff
+        token["auth_time"] = time.time()
+        return token
+
+
+class ClaimsCache:
+    """
+    Thread-safe LRU of validated tokens, each entry living until the
+    earlier of ``AUTH_CLAIMS_CACHE_TTL`` and the token expiry.
+    """
+
+    def __init__(self) -> None:
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, raw_token):
+        with self._lock:
+            entry = self._entries.get(raw_token)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[raw_token]
+                return None
+            self._entries.move_to_end(raw_token)
+            return entry[1]
+
+    def set(self, raw_token, validated_token) -> None:
+        ttl = min(settings.AUTH_CLAIMS_CACHE_TTL, validated_token["exp"] - time.time())
+        with self._lock:
+            self._entries[raw_token] = (time.monotonic() + ttl, validated_token)
+            self._entries.move_to_end(raw_token)
+            while len(self._entries) > settings.AUTH_CLAIMS_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id) -> None:
+        with self._lock:
+            for raw_token, (_, token) in list(self._entries.items()):
+                if token[api_settings.USER_ID_CLAIM] == user_id:
+                    del self._entries[raw_token]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+claims_cache = ClaimsCache()
+
+
+def revoke_user_tokens(user_id) -> None:
+    """
+    Reject every token issued to the user so far. Other processes stop
+    accepting them once their claims cache entries expire.
+    """
+    timeout = (
+        api_settings.REFRESH_TOKEN_LIFETIME + api_settings.ACCESS_TOKEN_LIFETIME
+    ).total_seconds()
+    cache.set(REVOKED_KEY.format(user_id), time.time(), timeout)
+    claims_cache.discard_user(user_id)
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    Request user answering ``id``, ``email`` and ``is_staff`` from token
+    claims. Anything else loads the ``User`` row on first access.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, validated_token, load_user):
+        super().__init__(load_user)
+        self.__dict__["_token"] = validated_token
+
+    @property
+    def id(self):
+        return self.__dict__["_token"][api_settings.USER_ID_CLAIM]
+
+    pk = id
+
+    @property
+    def email(self):
+        return self.__dict__["_token"]["email"]
+
+    @property
+    def is_staff(self):
+        return self.__dict__["_token"]["is_staff"]
+
+    def __bool__(self):
+        return True
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Trust the user claims of a signed token instead of loading the user
+    on every request. Tokens issued before the claims existed, and all
+    tokens while ``JWT_STATELESS_AUTH`` is off or the revocation cache is
+    unreachable, take the database path.
+    """
+
+    def authenticate(self, request):
+        if not settings.JWT_STATELESS_AUTH:
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = claims_cache.get(raw_token)
+        if validated_token is None:
+            validated_token = self.get_validated_token(raw_token)
+            if "auth_time" not in validated_token:
+                return self.get_user(validated_token), validated_token
+
+            try:
+                revoked_at = cache.get(
+                    REVOKED_KEY.format(validated_token[api_settings.USER_ID_CLAIM])
+                )
+            except RedisError as e:
+                # Revocations cannot be checked, so the claims are not
+                # trusted: the user row is loaded as for tokens without them
+                logger.warning(f"Token revocation cache unavailable: {e}")
+                return self.get_user(validated_token), validated_token
+            if revoked_at is not None and validated_token["auth_time"] <= revoked_at:
+                raise AuthenticationFailed(
+                    "Token has been revoked", code="token_not_valid"
+                )
+            claims_cache.set(raw_token, validated_token)
+
+        user = ClaimsUser(validated_token, partial(self.get_user, validated_token))
+        return user, validated_token
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def revoke_tokens_on_claim_change(sender, instance, raw, update_fields, **kwargs):
+    if raw or instance._state.adding:
+        return
+
+    fields = [
+        field
+        for field in CLAIM_FIELDS
+        if update_fields is None or field in update_fields
+    ]
+    if not fields:
+        return
+
+    stored = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    if stored is None or any(
+        stored[field] != getattr(instance, field) for field in fields
+    ):
+        transaction.on_commit(partial(revoke_user_tokens, instance.pk))
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(partial(revoke_user_tokens, instance.pk))
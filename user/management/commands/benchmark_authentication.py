@@ -0,0 +1,82 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from user.authentication import (
+    ClaimsJWTAuthentication,
+    ClaimsTokenObtainPairSerializer,
+    claims_cache,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure JWT authentication overhead per request with the user "
+        "loaded from the database, with trusted claims and a cold claims "
+        "cache, and with a warm claims cache; report latency and queries "
+        "as JSON."
+    )  # noqa
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(email__startswith="seed-user-").first()
+        if user is None:
+            raise CommandError("Not enough seeded data, run seed_load first.")
+
+        token = str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
+        request = RequestFactory().get("/", HTTP_AUTHORIZE=f"Bearer {token}")
+        authentication = ClaimsJWTAuthentication()
+        count = options["requests"]
+
+        report = {}
+        for mode, stateless, cold in (
+            ("database", False, True),
+            ("claims_cold", True, True),
+            ("claims_warm", True, False),
+        ):
+            with override_settings(JWT_STATELESS_AUTH=stateless):
+                report[mode] = self._measure(
+                    lambda: authentication.authenticate(request), count, cold
+                )
+                report[mode]["borrowing_list_queries"] = self._list_queries(token)
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    def _measure(authenticate, count, cold):
+        latencies = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(count):
+                if cold:
+                    claims_cache.clear()
+                started = time.perf_counter()
+                authenticate()
+                latencies.append(time.perf_counter() - started)
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "p50_us": round(percentiles[49] * 1_000_000, 1),
+            "p99_us": round(percentiles[98] * 1_000_000, 1),
+            "queries_per_request": round(len(queries) / count, 2),
+        }
+
+    @staticmethod
+    def _list_queries(token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZE=f"Bearer {token}")
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ), CaptureQueriesContext(connection) as queries:
+            client.get(reverse("borrowing:borrowing-list"))
+        return len(queries)
@@ -1,9 +1,20 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.test import RequestFactory, TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
+from redis.exceptions import RedisError
 from rest_framework import status
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
 
+from user.authentication import (
+    ClaimsJWTAuthentication,
+    ClaimsTokenObtainPairSerializer,
+    claims_cache,
+)
 from user.models import User
 
 
@@ -77,3 +88,87 @@ class ManageUserViewTest(TestCase):
     def test_manage_user_view_unauthenticated(self):
         response = self.client.get(reverse("user:manage"))
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ClaimsJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        claims_cache.clear()
+        self.user = User.objects.create_user(
+            email="claims@example.com", password="password123"
+        )
+        self.authentication = ClaimsJWTAuthentication()
+
+    def authenticate(self, token):
+        request = RequestFactory().get("/", HTTP_AUTHORIZE=f"Bearer {token}")
+        return self.authentication.authenticate(request)
+
+    def test_claims_are_trusted_without_loading_the_user(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(token)
+            self.assertEqual(user.id, self.user.id)
+            self.assertEqual(user.email, "claims@example.com")
+            self.assertFalse(user.is_staff)
+            self.assertTrue(user.is_authenticated)
+
+        # anything beyond the claims loads the user
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password("password123"))
+
+    def test_tokens_without_claims_load_the_user(self):
+        token = AccessToken.for_user(self.user)
+
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate(token)
+
+        self.assertIsInstance(user, User)
+
+    @override_settings(JWT_STATELESS_AUTH=False)
+    def test_stateless_mode_can_be_disabled(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate(token)
+
+        self.assertIsInstance(user, User)
+
+    def test_cache_outage_falls_back_to_the_user_row(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+
+        with patch.object(
+            cache, "get", side_effect=RedisError("Connection refused")
+        ), self.assertNumQueries(1):
+            user, _ = self.authenticate(token)
+
+        self.assertIsInstance(user, User)
+        # the token is checked against the cache again once it is back
+        with self.assertNumQueries(0):
+            self.authenticate(token)
+
+    def test_changing_a_claim_revokes_issued_tokens(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.authenticate(token)
+
+        self.user.is_staff = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+        new_token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        user, _ = self.authenticate(new_token)
+        self.assertTrue(user.is_staff)
+
+    def test_saving_other_fields_keeps_tokens_valid(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.save()
+            self.user.save(update_fields=["last_login"])
+
+        self.assertEqual(callbacks, [])
+        user, _ = self.authenticate(token)
+        self.assertEqual(user.id, self.user.id)